@@ -0,0 +1,262 @@
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.log import get_logger
+
+from dotenv import load_dotenv
+load_dotenv()
+
+log = get_logger("browser_pool")
+
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+BROWSER_RECYCLE_PAGES = int(os.getenv("BROWSER_RECYCLE_PAGES", "50"))
+BROWSER_ACQUIRE_TIMEOUT = float(os.getenv("BROWSER_ACQUIRE_TIMEOUT", "30"))
+BROWSER_HEADLESS = os.getenv("BROWSER_HEADLESS", "1") != "0"
+
+
+class _Slot:
+    def __init__(self, index: int):
+        self.index = index
+        self.browser = None
+        self.pages_served = 0
+
+
+class BrowserPool:
+    """
+    Process-wide pool of long-lived Chromium browsers.
+
+    Playwright objects belong to the event loop that created them, so the pool
+    runs its own loop on a daemon thread. Callers on any thread hand it a
+    coroutine function that receives a fresh browser context; the context is
+    always closed afterwards and the browser is recycled after
+    ``recycle_after`` pages or as soon as it disconnects.
+    """
+
+    def __init__(self, size: int = BROWSER_POOL_SIZE, recycle_after: int = BROWSER_RECYCLE_PAGES,
+                 acquire_timeout: float = BROWSER_ACQUIRE_TIMEOUT, headless: bool = BROWSER_HEADLESS):
+        self.size = max(1, size)
+        self.recycle_after = max(1, recycle_after)
+        self.acquire_timeout = acquire_timeout
+        self.headless = headless
+
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        # set once the browsers are launched; _thread is set before that
+        self._ready = threading.Event()
+        self._playwright = None
+        self._idle: Optional[asyncio.Queue] = None
+        self._slots = []
+
+        self.metrics = {
+            "launches": 0,
+            "launch_failures": 0,
+            "recycles": 0,
+            "crashes": 0,
+            "acquires": 0,
+            "waits": 0,
+            "wait_seconds_total": 0.0,
+            "pages": 0,
+        }
+
+    # ------------------------------------------------------------------
+    # lifecycle
+    # ------------------------------------------------------------------
+    def start(self):
+        """Start the pool loop and launch all browsers. Safe to call repeatedly."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._run_loop, name="browser-pool", daemon=True)
+            self._thread.start()
+            try:
+                asyncio.run_coroutine_threadsafe(self._astart(), self._loop).result()
+                self._ready.set()
+            except Exception:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._thread.join(timeout=10)
+                self._loop.close()
+                self._thread = None
+                self._loop = None
+                raise
+
+    def shutdown(self):
+        """Close every browser, stop Playwright and the pool loop."""
+        with self._lock:
+            if self._thread is None:
+                return
+            self._ready.clear()
+            try:
+                asyncio.run_coroutine_threadsafe(self._astop(), self._loop).result(timeout=30)
+            except Exception as e:
+                log.error("browser pool shutdown error: %s", e)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=10)
+            self._loop.close()
+            self._thread = None
+            self._loop = None
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    async def _astart(self):
+        # Playwright is only needed once a page has to be rendered
+        from playwright.async_api import async_playwright
+        self._playwright = await async_playwright().start()
+        self._idle = asyncio.Queue()
+        self._slots = [_Slot(i) for i in range(self.size)]
+        for slot in self._slots:
+            try:
+                await self._launch(slot)
+            except Exception as e:
+                # the slot is relaunched lazily on its first acquire
+                log.warning("browser %d launch failed: %s", slot.index, e)
+            self._idle.put_nowait(slot)
+
+    async def _astop(self):
+        for slot in self._slots:
+            await self._close(slot)
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    # ------------------------------------------------------------------
+    # slots
+    # ------------------------------------------------------------------
+    async def _launch(self, slot: _Slot):
+        try:
+            slot.browser = await self._playwright.chromium.launch(headless=self.headless)
+        except Exception:
+            self.metrics["launch_failures"] += 1
+            raise
+        slot.pages_served = 0
+        self.metrics["launches"] += 1
+
+    async def _close(self, slot: _Slot):
+        if slot.browser is None:
+            return
+        try:
+            await slot.browser.close()
+        except Exception:
+            pass
+        slot.browser = None
+
+    async def _acquire(self) -> _Slot:
+        started = time.monotonic()
+        if self._idle.empty():
+            self.metrics["waits"] += 1
+        slot = await asyncio.wait_for(self._idle.get(), timeout=self.acquire_timeout)
+        self.metrics["acquires"] += 1
+        self.metrics["wait_seconds_total"] += time.monotonic() - started
+
+        # health check: a browser that died while idle is replaced before use
+        if slot.browser is None or not slot.browser.is_connected():
+            if slot.browser is not None:
+                self.metrics["crashes"] += 1
+            await self._close(slot)
+            try:
+                await self._launch(slot)
+            except Exception:
+                self._idle.put_nowait(slot)
+                raise
+        return slot
+
+    async def _release(self, slot: _Slot, crashed: bool):
+        slot.pages_served += 1
+        self.metrics["pages"] += 1
+        if crashed or slot.pages_served >= self.recycle_after:
+            if crashed:
+                self.metrics["crashes"] += 1
+            self.metrics["recycles"] += 1
+            await self._close(slot)
+            try:
+                await self._launch(slot)
+            except Exception as e:
+                log.warning("browser %d relaunch failed: %s", slot.index, e)
+        self._idle.put_nowait(slot)
+
+    async def _run(self, fn: Callable[[Any], Awaitable[Any]]):
+        slot = await self._acquire()
+        context = None
+        crashed = False
+        try:
+            context = await slot.browser.new_context(java_script_enabled=True)
+            return await fn(context)
+        except Exception:
+            crashed = slot.browser is None or not slot.browser.is_connected()
+            raise
+        finally:
+            if context is not None:
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+            await self._release(slot, crashed)
+
+    # ------------------------------------------------------------------
+    # public API
+    # ------------------------------------------------------------------
+    def run(self, fn: Callable[[Any], Awaitable[Any]], timeout: Optional[float] = None):
+        """
+        Run ``fn(context)`` on a pooled browser and return its result.
+        ``fn`` must be an ``async def`` taking a Playwright BrowserContext.
+        """
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(self._run(fn), self._loop)
+        try:
+            return future.result(timeout)
+        except Exception:
+            future.cancel()
+            raise
+
+    async def arun(self, fn: Callable[[Any], Awaitable[Any]]):
+        """
+        Async variant of ``run`` for callers on another event loop. Awaiting
+        does not tie up a thread, and cancelling the caller cancels the render.
+        """
+        if not self._ready.is_set():
+            # start() holds the lock until the browsers are up, so a caller
+            # arriving mid-start waits for it instead of racing ahead
+            await asyncio.to_thread(self.start)
+        future = asyncio.run_coroutine_threadsafe(self._run(fn), self._loop)
+        try:
+            return await asyncio.wrap_future(future)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        idle = self._idle.qsize() if self._idle is not None else 0
+        return {
+            "running": self._thread is not None,
+            "size": self.size,
+            "idle": idle,
+            "in_use": self.size - idle if self._thread is not None else 0,
+            "recycle_after": self.recycle_after,
+            **self.metrics,
+        }
+
+
+_pool: Optional[BrowserPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> BrowserPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool()
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
@@ -1,16 +1,27 @@
+import asyncio
+import base64
+import binascii
 import os
 from pathlib import Path
-import requests
 import time
 import re
-from typing import List,Tuple
-from urllib.parse import urljoin, urlparse
-from playwright.sync_api import sync_playwright
+from typing import List,Optional,Tuple
+from app.browser_pool import get_pool
+from app import downloader
+from app.deadline import Deadline, DeadlineExceeded, timeout_for
+from app.html_extract import extract_page, find_submit_and_question, result_text
+from app.http_client import get_async_client, run_sync
+from app.render_profiles import WAIT_JS, get_profile, record_phases
+from app.log import get_logger
+from app.metrics import FETCHES
+from app.tracing import span
 
 from dotenv import load_dotenv
 load_dotenv()
 
-DOWNLOAD_DIR = os.getenv("DOWNLOAD_DIR","/temp/llm_quiz_file")
+log = get_logger("browser")
+
+DOWNLOAD_DIR = downloader.DOWNLOAD_DIR
 
 def ensure_dir(d):
     Path(d).mkdir(parents=True,exist_ok=True)
@@ -18,105 +29,206 @@ def ensure_dir(d):
 ensure_dir(DOWNLOAD_DIR)
 
 
-def fetch_page_rendered_html(url: str, timeout_ms: int = 60000):
+async def afetch_page_rendered_html(url: str, timeout_ms: int = 60000, deadline: Optional[Deadline] = None,
+                                    report: Optional[dict] = None):
     """
     Fetch fully rendered HTML from a JS-heavy page.
     Robust version for TDS LLM Analysis Quiz.
+
+    Uses a warm browser from the process-wide pool with a fresh context per
+    fetch, so only the first page pays for Chromium start-up. With a
+    deadline, each attempt is limited to the time left and retries stop once
+    it is spent.
+
+    The host's RenderProfile decides which requests are blocked and how long
+    to wait. Per-phase timings (goto, wait, evaluate) are written into
+    ``report`` when given.
     """
 
     MAX_RETRIES = 3
-    wait_selector = "#result"  # used in demo pages
+    profile = get_profile(url)
     last_error = None
 
+    async def _route(route):
+        request = route.request
+        if profile.should_block(request.resource_type, request.url, url):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _render(context, timeout_ms):
+        phases = {"profile": profile.name}
+        t_start = time.perf_counter()
+        await context.route("**/*", _route)
+        page = await context.new_page()
+
+        # go to page
+        t0 = time.perf_counter()
+        await page.goto(url, timeout=timeout_ms, wait_until="domcontentloaded")
+        phases["goto"] = round(time.perf_counter() - t0, 3)
+
+        # wait for the selector, for DOM mutations to settle, or for the ceiling
+        t0 = time.perf_counter()
+        ceiling = min(profile.ceiling_ms, timeout_ms)
+        try:
+            phases["wait_reason"] = await page.evaluate(
+                WAIT_JS, {"selector": profile.wait_selector, "settleMs": profile.settle_ms, "ceilingMs": ceiling}
+            )
+        except Exception as e:
+            # e.g. a client-side navigation destroyed the context mid-wait
+            phases["wait_reason"] = f"error: {e}"
+        phases["wait"] = round(time.perf_counter() - t0, 3)
+
+        # get FULL rendered HTML
+        t0 = time.perf_counter()
+        html = await page.evaluate("() => document.documentElement.innerHTML")
+        phases["evaluate"] = round(time.perf_counter() - t0, 3)
+        phases["total"] = round(time.perf_counter() - t_start, 3)
+        record_phases(phases)
+        if report is not None:
+            report.update(phases)
+        return html, page.url
+
     for attempt in range(MAX_RETRIES):
         try:
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=False)
-                context = browser.new_context(java_script_enabled=True)
-                page = context.new_page()
+            if deadline is None:
+                return await get_pool().arun(lambda ctx: _render(ctx, timeout_ms))
+            attempt_ms = int(deadline.timeout(timeout_ms / 1000) * 1000)
+            return await deadline.run(get_pool().arun(lambda ctx: _render(ctx, attempt_ms)))
+        except DeadlineExceeded as e:
+            last_error = e
+            break
+        except Exception as e:
+            last_error = e
+            if deadline is not None and deadline.is_short(1):
+                break
+            await asyncio.sleep(1)  # retry delay
 
-                # go to page
-                page.goto(url, timeout=timeout_ms, wait_until="domcontentloaded")
+    # if all retries fail
+    log.error("render failed for %s: %s", url, last_error)
+    return "", url
 
-                # wait for JS to load relevant content
-                try:
-                    page.wait_for_selector(wait_selector, timeout=5000)
-                except Exception:
-                    # fallback: wait a little extra for JS
-                    time.sleep(2)
 
-                # IMPORTANT: evaluate JS fully before extracting
-                page.wait_for_load_state("networkidle", timeout=timeout_ms)
+def fetch_page_rendered_html(url: str, timeout_ms: int = 60000, deadline: Optional[Deadline] = None):
+    return run_sync(afetch_page_rendered_html(url, timeout_ms, deadline))
 
-                # get FULL rendered HTML
-                html = page.evaluate("() => document.documentElement.innerHTML")
-                current_url = page.url
 
-                browser.close()
-                return html, current_url
+FETCH_FAST_PATH = os.getenv("FETCH_FAST_PATH", "1") != "0"
+FETCH_HTTP_TIMEOUT = float(os.getenv("FETCH_HTTP_TIMEOUT", "10"))
 
-        except Exception as e:
-            last_error = e
-            time.sleep(1)  # retry delay
+# how many pages each fetch tier served
+FETCH_TIER_COUNTS = {"http": 0, "browser": 0}
 
-    # if all retries fail
-    print("HTML RENDER ERROR:", last_error)
-    return "", url
+_SCRIPT_RE = re.compile(r"<script\b[^>]*>(.*?)</script>", re.DOTALL | re.IGNORECASE)
+_ATOB_RE = re.compile(r"atob\(\s*(['\"`])([A-Za-z0-9+/=\s]+)\1\s*\)")
+_EMPTY_RESULT_RE = re.compile(r'(<div[^>]*id=["\']result["\'][^>]*>)\s*(</div>)', re.IGNORECASE)
 
 
-def find_submit_and_question_from_html(html:str)->Tuple[str,str]:
-    submit = None
-    m = re.search(r"https?://[^\s'\"<>]+/submit[^\s'\"<>]*", html)
-    if m:
-        submit = m.group(0)
-
-    q = ""
-    m2 = re.search(r'<div[^>]*id=["\']result["\'][^>]*>(.*?)</div>', html, flags=re.DOTALL | re.IGNORECASE)
-    if m2:
-        q = re.sub(r"<[^>]+>", "", m2.group(1)).strip()
-    if not q:
-        # fallback: first <pre> contents
-        m3 = re.search(r"<pre[^>]*>(.*?)</pre>", html, flags=re.DOTALL | re.IGNORECASE)
-        if m3:
-            q = re.sub(r"<[^>]+>", "", m3.group(1)).strip()
-    return submit, q
-
-
-def download_links_from_page(url:str, html:str)-> List[str]:
-    matches = []
-    for ext in [".csv",".pdf",".xlsx",".json",".zip"]:
-        import re
-        for m in re.finditer(r'href=["\']([^"\']+%s)["\']' % re.escape(ext), html, flags=re.IGNORECASE):
-            matches.append(m.group(1))
-
-        saved = []
-        for link in matches:
-            if link.startswith("//"):
-                parsed = urlparse(url)
-                link = f"{parsed.scheme}:{link}"
-            if not urlparse(link).netloc:
-                link = urljoin(url, link)
+def decode_inline_scripts(html: str) -> str:
+    """
+    Statically apply the common "innerHTML = atob('...')" pattern: decode
+    every base64 literal passed to atob() in inline scripts and place the
+    result in the (empty) #result div, or append one when there is none.
+    """
+    decoded = []
+    for script in _SCRIPT_RE.findall(html):
+        if "atob" not in script:
+            continue
+        for m in _ATOB_RE.finditer(script):
             try:
-                local = download_file(link)
-                saved.append(local)
-            except Exception as e:
-                print("download failed", link, e)
-        return saved
+                decoded.append(base64.b64decode(re.sub(r"\s+", "", m.group(2))).decode("utf-8", errors="replace"))
+            except (binascii.Error, ValueError):
+                continue
+    if not decoded:
+        return html
+    content = "\n".join(decoded)
+    if _EMPTY_RESULT_RE.search(html):
+        return _EMPTY_RESULT_RE.sub(lambda m: m.group(1) + content + m.group(2), html, count=1)
+    return html + f'<div id="result">{content}</div>'
+
+
+def needs_render(html: str) -> bool:
+    """
+    An empty #result left after decode_inline_scripts: a script we cannot
+    run statically fills it, and any <pre> example or page text would be
+    taken for the question.
+    """
+    return result_text(html) == ""
 
-def download_file(url: str) -> str:
+
+async def afetch_page_static(url: str, deadline: Optional[Deadline] = None) -> Optional[Tuple[str, str]]:
+    """
+    Tier 1: plain GET over the pooled HTTP client plus static script
+    decoding. Returns (html, final_url) only when both the question and the
+    submit URL could be found without running any JavaScript, and no empty
+    #result is left for a script to fill.
+    """
+    try:
+        with span("fetch_http"):
+            r = await get_async_client().get(url, timeout=timeout_for(deadline, FETCH_HTTP_TIMEOUT))
+            r.raise_for_status()
+    except Exception as e:
+        log.info("static fetch failed %s: %s", url, e)
+        return None
+    if "html" not in r.headers.get("content-type", "text/html"):
+        return None
+    html = decode_inline_scripts(r.text)
+    if needs_render(html):
+        return None
+    submit, question = find_submit_and_question_from_html(html, str(r.url))
+    if not (submit and question):
+        return None
+    return html, str(r.url)
+
+
+async def afetch_page(url: str, deadline: Optional[Deadline] = None) -> Tuple[str, str, dict]:
+    """
+    Tiered page fetch: try the HTTP fast path first and escalate to the
+    browser pool only when the page really needs JavaScript.
+    Returns (html, final_url, info); info["tier"] is "http" or "browser",
+    and browser renders add their phase timings.
+    """
+    if FETCH_FAST_PATH:
+        static = await afetch_page_static(url, deadline)
+        if static is not None:
+            FETCH_TIER_COUNTS["http"] += 1
+            FETCHES.inc(tier="http")
+            return static[0], static[1], {"tier": "http"}
+    info = {"tier": "browser"}
+    with span("render") as attrs:
+        html, final_url = await afetch_page_rendered_html(url, deadline=deadline, report=info)
+        attrs.update(info)
+    FETCH_TIER_COUNTS["browser"] += 1
+    FETCHES.inc(tier="browser")
+    return html, final_url, info
+
+
+def find_submit_and_question_from_html(html: str, base_url: Optional[str] = None) -> Tuple[Optional[str], str]:
+    return find_submit_and_question(html, base_url)
+
+
+def find_attachment_links(url:str, html:str)-> List[str]:
+    """
+    Collect every attachment link on the page as absolute URLs, deduplicated
+    and in page order.
+    """
+    return extract_page(html, url).attachments
+
+
+async def adownload_links_from_page(url:str, html:str, deadline: Optional[Deadline] = None)-> List[str]:
+    return await downloader.fetch_all(find_attachment_links(url, html), deadline)
+
+
+def download_links_from_page(url:str, html:str, deadline: Optional[Deadline] = None)-> List[str]:
+    return run_sync(adownload_links_from_page(url, html, deadline))
+
+
+async def adownload_file(url: str) -> str:
     """
-    Download a file to DOWNLOAD_DIR and return path
+    Download a file into the content-addressed store under DOWNLOAD_DIR and return path
     """
-    ensure_dir(DOWNLOAD_DIR)
-    r = requests.get(url, stream=True, timeout=30)
-    r.raise_for_status()
-    fname = url.split("/")[-1].split("?")[0]
-    if not fname:
-        fname = "file.bin"
-    safe = re.sub(r"[^A-Za-z0-9._-]", "_", fname)
-    path = os.path.join(DOWNLOAD_DIR, safe)
-    with open(path, "wb") as f:
-        for chunk in r.iter_content(chunk_size=8192):
-            if chunk:
-                f.write(chunk)
-    return path
+    return await downloader.fetch(url)
+
+
+def download_file(url: str) -> str:
+    return run_sync(adownload_file(url))
@@ -0,0 +1,218 @@
+import os
+from importlib.util import find_spec
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+
+# checked without importing: pyarrow is only loaded when a table is read
+HAVE_PYARROW = find_spec("pyarrow") is not None
+
+from dotenv import load_dotenv
+load_dotenv()
+
+DATASET_PREVIEW_ROWS = int(os.getenv("DATASET_PREVIEW_ROWS", "20"))
+DATASET_CHUNK_ROWS = int(os.getenv("DATASET_CHUNK_ROWS", "200000"))
+
+REDUCTIONS = ("sum", "mean", "count", "min", "max")
+
+
+def downcast(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Shrink integer columns to the smallest dtype that holds them. Floats
+    stay float64: float32 would change sums and filters on exact answers.
+    """
+    for col in df.columns:
+        s = df[col]
+        if pd.api.types.is_integer_dtype(s):
+            df[col] = pd.to_numeric(s, downcast="integer")
+    return df
+
+
+def _is_numeric(s: pd.Series) -> bool:
+    return pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s)
+
+
+def _scalar(value):
+    """NumPy scalars as plain Python values (int stays int)."""
+    return value.item() if hasattr(value, "item") else value
+
+
+class LazyDataset:
+    """
+    A table that is only read as far as a question needs.
+
+    ``preview``/``schema`` read the first few rows, ``load`` reads only the
+    requested columns, and ``reduce``/``groupby_agg`` stream CSVs in chunks so
+    the full frame is never held in memory. Excel files cannot be streamed and
+    are loaded once (column-pruned) and kept; in-memory frames (e.g. PDF
+    tables) are wrapped as-is. ``key`` is a content hash of the data when
+    the caller already knows one.
+    """
+
+    def __init__(self, path: Optional[str] = None, frame: Optional[pd.DataFrame] = None, key: Optional[str] = None):
+        self.path = path
+        self.key = key
+        self.kind = "frame" if frame is not None else ("excel" if Path(path).suffix.lower() in (".xlsx", ".xls") else "csv")
+        self._frame = frame
+        self._preview: Optional[pd.DataFrame] = None
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, key: Optional[str] = None) -> "LazyDataset":
+        return cls(frame=frame, key=key)
+
+    # ------------------------------------------------------------------
+    # schema pass
+    # ------------------------------------------------------------------
+    def preview(self, n: int = DATASET_PREVIEW_ROWS) -> pd.DataFrame:
+        if self._frame is not None:
+            return self._frame.head(n)
+        if self._preview is None or len(self._preview) < n:
+            if self.kind == "csv":
+                self._preview = pd.read_csv(self.path, nrows=n)
+            else:
+                self._preview = pd.read_excel(self.path, nrows=n)
+        return self._preview.head(n)
+
+    def head(self, n: int = DATASET_PREVIEW_ROWS) -> pd.DataFrame:
+        return self.preview(n)
+
+    @property
+    def columns(self) -> List[str]:
+        return [str(c) for c in self.preview().columns]
+
+    @property
+    def schema(self) -> Dict[str, str]:
+        return {str(c): str(t) for c, t in self.preview().dtypes.items()}
+
+    # ------------------------------------------------------------------
+    # compute pass
+    # ------------------------------------------------------------------
+    def _usecols(self, columns: Optional[List[str]]):
+        if not columns:
+            return None
+        known = set(self.columns)
+        missing = [c for c in columns if c not in known]
+        if missing:
+            raise KeyError(f"unknown columns {missing}")
+        return list(dict.fromkeys(columns))
+
+    def load(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Read the whole table, restricted to ``columns`` when given."""
+        usecols = self._usecols(columns)
+        if self._frame is not None:
+            return self._frame if usecols is None else self._frame[usecols]
+        if self.kind == "excel":
+            # no chunked reader for Excel: load once and keep it
+            self._frame = downcast(pd.read_excel(self.path))
+            return self.load(columns)
+        df = self._read_csv_arrow(usecols) if HAVE_PYARROW else None
+        if df is None:
+            df = pd.read_csv(self.path, usecols=usecols, low_memory=True)
+        return downcast(df)
+
+    def _read_csv_arrow(self, usecols: Optional[List[str]]) -> Optional[pd.DataFrame]:
+        """
+        Multithreaded CSV read. Columns the preview reads as text are kept as
+        text: left alone, pyarrow turns ISO dates into date objects that no
+        longer match what pandas (and the prompt's preview) shows. None when
+        pyarrow cannot read the file the way pandas would.
+        """
+        import pyarrow as pa
+        from pyarrow import csv as pacsv
+        preview = self.preview()
+        text = [str(c) for c, t in preview.dtypes.items()
+                if (pd.api.types.is_object_dtype(t) or pd.api.types.is_string_dtype(t))
+                and (usecols is None or c in usecols)]
+        options = pacsv.ConvertOptions(include_columns=usecols or [], strings_can_be_null=True,
+                                       column_types={c: pa.string() for c in text})
+        try:
+            df = pacsv.read_csv(self.path, convert_options=options).to_pandas()
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            return None
+        # pandas renames duplicate headers (a, a.1); anything else means the reads disagree
+        return df if list(df.columns) == (usecols or list(preview.columns)) else None
+
+    def iter_chunks(self, columns: Optional[List[str]] = None, chunksize: int = DATASET_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+        usecols = self._usecols(columns)
+        if self.kind != "csv":
+            frame = self.load(usecols)
+            for start in range(0, len(frame), chunksize):
+                yield frame.iloc[start:start + chunksize]
+            return
+        for chunk in pd.read_csv(self.path, usecols=usecols, chunksize=chunksize):
+            yield downcast(chunk)
+
+    # ------------------------------------------------------------------
+    # streaming reductions
+    # ------------------------------------------------------------------
+    def is_numeric(self, column: str) -> bool:
+        """Whether ``column`` reads as numbers (judged from the preview)."""
+        return column in self.preview().columns and _is_numeric(self.preview()[column])
+
+    def _pandas_reduce(self, column: str, op: str):
+        return _scalar(getattr(self.load([column])[column], op)())
+
+    def reduce(self, column: str, op: str):
+        """
+        sum / mean / count / min / max of one column. Numeric columns are
+        streamed chunk by chunk (integer sums stay integers); anything else
+        (strings, dates) is handed to pandas, so min/max compare the values
+        as pandas would.
+        """
+        if op not in REDUCTIONS:
+            raise ValueError(f"unsupported reduction {op}")
+        if op != "count" and not self.is_numeric(column):
+            return self._pandas_reduce(column, op)
+        total, count, lo, hi = 0, 0, None, None
+        for chunk in self.iter_chunks([column]):
+            s = chunk[column]
+            if op == "count":
+                count += int(s.count())
+                continue
+            if not _is_numeric(s):
+                # the preview looked numeric but this chunk is not
+                return self._pandas_reduce(column, op)
+            s = s.dropna()
+            if s.empty:
+                continue
+            total += _scalar(s.sum())
+            count += int(s.size)
+            lo = _scalar(s.min()) if lo is None else min(lo, _scalar(s.min()))
+            hi = _scalar(s.max()) if hi is None else max(hi, _scalar(s.max()))
+        if op == "count":
+            return count
+        if op == "sum":
+            return total
+        if op == "mean":
+            return total / count if count else float("nan")
+        return lo if op == "min" else hi
+
+    def groupby_agg(self, by: str, column: str, op: str) -> pd.Series:
+        """
+        Streaming ``df.groupby(by)[column].agg(op)`` built from per-chunk
+        partials; non-numeric value columns are grouped by pandas in one go.
+        """
+        if op not in REDUCTIONS:
+            raise ValueError(f"unsupported reduction {op}")
+        if op != "count" and not self.is_numeric(column):
+            return self.load([by, column]).groupby(by)[column].agg(op)
+        partials = []
+        for chunk in self.iter_chunks([by, column]):
+            values = chunk[column]
+            if op != "count" and not _is_numeric(values):
+                return self.load([by, column]).groupby(by)[column].agg(op)
+            g = values.groupby(chunk[by])
+            if op == "mean":
+                partials.append(pd.DataFrame({"sum": g.sum(), "count": g.count()}))
+            else:
+                partials.append(g.agg(op).to_frame(op))
+        if not partials:
+            return pd.Series(dtype="float64")
+        combined = pd.concat(partials).groupby(level=0)
+        if op == "mean":
+            sums = combined.sum()
+            return sums["sum"] / sums["count"]
+        if op in ("sum", "count"):
+            return combined[op].sum()
+        return combined[op].agg(op)
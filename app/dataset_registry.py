@@ -0,0 +1,306 @@
+import io
+import json
+import os
+import re
+import threading
+import zipfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import IO, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from app.dataset import HAVE_PYARROW, LazyDataset, downcast
+from app.log import get_logger
+from app.pdf_engine import extract_pdf, file_hash
+from app.tracing import span
+
+from dotenv import load_dotenv
+load_dotenv()
+
+log = get_logger("datasets")
+
+# parsed tables kept across steps and solves, keyed by content hash
+DATASET_CACHE_MAX_MB = float(os.getenv("DATASET_CACHE_MAX_MB", "512"))
+# ZIP members are parsed straight from the archive; these bound what is read
+DATASET_ZIP_MAX_MEMBERS = int(os.getenv("DATASET_ZIP_MAX_MEMBERS", "50"))
+DATASET_ZIP_MAX_MB = float(os.getenv("DATASET_ZIP_MAX_MB", "512"))
+
+TABLE_EXTENSIONS = (".csv", ".xlsx", ".xls", ".json", ".zip", ".pdf")
+
+_NAME_RE = re.compile(r"[^0-9a-zA-Z]+")
+
+
+def table_name(*parts: str) -> str:
+    """'Sales Data', 'Q1 2024' -> 'sales_data_q1_2024'."""
+    return "_".join(p for p in (_NAME_RE.sub("_", part).strip("_").lower() for part in parts) if p) or "table"
+
+
+# ----------------------------------------------------------------------
+# content keys + parsed-frame cache
+# ----------------------------------------------------------------------
+# (path, mtime, size) -> sha256; bounded LRU, and entries go with their frames
+_CONTENT_KEYS_MAX = 4096
+_content_keys: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+_content_keys_lock = threading.Lock()
+
+
+def content_key(path: str) -> str:
+    """sha256 of a file, memoised per (path, mtime, size)."""
+    st = os.stat(path)
+    version = (path, st.st_mtime_ns, st.st_size)
+    with _content_keys_lock:
+        if version in _content_keys:
+            _content_keys.move_to_end(version)
+            return _content_keys[version]
+    key = file_hash(path)
+    with _content_keys_lock:
+        _content_keys[version] = key
+        while len(_content_keys) > _CONTENT_KEYS_MAX:
+            _content_keys.popitem(last=False)
+    return key
+
+
+def _forget_content_key(key: str):
+    with _content_keys_lock:
+        for version in [v for v, k in _content_keys.items() if k == key]:
+            del _content_keys[version]
+
+
+class FrameCache:
+    """
+    Parsed tables of a file, keyed by its content hash, bounded by memory.
+    Stored columnar (Arrow tables when pyarrow is installed, otherwise
+    downcast frames) and evicted least-recently-used first. Frames Arrow
+    cannot hold unchanged (mixed-type object columns, duplicate or
+    non-string column names) are kept as pandas frames.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[Dict[str, object], int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @staticmethod
+    def _pack(df: pd.DataFrame):
+        names = list(df.columns)
+        # Arrow would stringify non-string names and rejects duplicates
+        if HAVE_PYARROW and all(isinstance(c, str) for c in names) and len(set(names)) == len(names):
+            import pyarrow as pa
+            try:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                return table, table.nbytes
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+                log.debug("frame kept as pandas: %s", e)
+        df = downcast(df)
+        return df, int(df.memory_usage(deep=True).sum())
+
+    @staticmethod
+    def _unpack(stored) -> pd.DataFrame:
+        return stored if isinstance(stored, pd.DataFrame) else stored.to_pandas()
+
+    def get(self, key: str) -> Optional[Dict[str, pd.DataFrame]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+        return {name: self._unpack(stored) for name, stored in entry[0].items()}
+
+    def set(self, key: str, frames: Dict[str, pd.DataFrame]):
+        packed, size = {}, 0
+        for name, df in frames.items():
+            packed[name], nbytes = self._pack(df)
+            size += nbytes
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (packed, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                old, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.stats["evictions"] += 1
+                _forget_content_key(old.split(":", 1)[0])
+
+    def info(self) -> Dict[str, float]:
+        with self._lock:
+            return {**self.stats, "entries": len(self._entries), "mb": round(self._bytes / 2 ** 20, 2)}
+
+
+_frames: Optional[FrameCache] = None
+_frames_lock = threading.Lock()
+
+
+def get_frame_cache() -> FrameCache:
+    global _frames
+    with _frames_lock:
+        if _frames is None:
+            _frames = FrameCache(int(DATASET_CACHE_MAX_MB * 2 ** 20))
+        return _frames
+
+
+# ----------------------------------------------------------------------
+# parsers: one file -> {table name: frame}
+# ----------------------------------------------------------------------
+def _json_frames(obj, name: str) -> Dict[str, pd.DataFrame]:
+    """Records -> rows (nested keys flattened to a.b columns); objects of record lists -> one table per list."""
+    if isinstance(obj, list):
+        if obj and all(isinstance(item, dict) for item in obj):
+            return {name: pd.json_normalize(obj)}
+        return {name: pd.DataFrame({"value": obj})}
+    if isinstance(obj, dict):
+        lists = {k: v for k, v in obj.items() if isinstance(v, list) and v and all(isinstance(i, dict) for i in v)}
+        if len(lists) == 1:
+            return {name: pd.json_normalize(next(iter(lists.values())))}
+        if lists:
+            return {table_name(name, k): pd.json_normalize(v) for k, v in lists.items()}
+        if obj and all(isinstance(v, list) for v in obj.values()) and len({len(v) for v in obj.values()}) == 1:
+            # column-oriented: {"a": [...], "b": [...]}
+            return {name: pd.DataFrame(obj)}
+        return {name: pd.json_normalize(obj)}
+    return {}
+
+
+def _read_json(fh: IO[bytes], name: str) -> Dict[str, pd.DataFrame]:
+    raw = fh.read()
+    try:
+        return _json_frames(json.loads(raw), name)
+    except ValueError:
+        # JSON Lines
+        return {name: pd.read_json(io.BytesIO(raw), lines=True)}
+
+
+def _read_excel(fh, name: str) -> Dict[str, pd.DataFrame]:
+    sheets = pd.read_excel(fh, sheet_name=None)
+    if len(sheets) == 1:
+        return {name: next(iter(sheets.values()))}
+    return {table_name(name, str(sheet)): df for sheet, df in sheets.items()}
+
+
+def _read_stream(fh: IO[bytes], ext: str, name: str) -> Dict[str, pd.DataFrame]:
+    if ext == ".csv":
+        return {name: pd.read_csv(fh)}
+    if ext in (".xlsx", ".xls"):
+        return _read_excel(fh, name)
+    if ext == ".json":
+        return _read_json(fh, name)
+    return {}
+
+
+def _read_zip(path: str) -> Dict[str, pd.DataFrame]:
+    """Every tabular member, read straight from the archive (nothing is extracted to disk)."""
+    frames: Dict[str, pd.DataFrame] = {}
+    budget = DATASET_ZIP_MAX_MB * 2 ** 20
+    with zipfile.ZipFile(path) as zf:
+        members = [i for i in zf.infolist() if not i.is_dir() and not i.filename.startswith("__MACOSX/")
+                   and Path(i.filename).suffix.lower() in (".csv", ".xlsx", ".xls", ".json")]
+        for info in members[:DATASET_ZIP_MAX_MEMBERS]:
+            budget -= info.file_size
+            if budget < 0:
+                log.warning("zip %s: stopping at %s, over DATASET_ZIP_MAX_MB", path, info.filename)
+                break
+            member = Path(info.filename)
+            try:
+                with zf.open(info) as fh:
+                    frames.update(_read_stream(fh, member.suffix.lower(), table_name(member.stem)))
+            except Exception as e:
+                log.warning("zip member parse error %s!%s: %s", path, info.filename, e)
+    return frames
+
+
+def parse_tables(path: str, pdf_pages: Optional[List[int]] = None, name: Optional[str] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Every table in one file, by name. Tables are named after ``name`` (the
+    file's original name) when given, else after the file itself. CSV files
+    are not handled here (they stay lazy).
+    """
+    ext = Path(path).suffix.lower()
+    name = table_name(Path(name or path).stem)
+    if ext == ".zip":
+        return _read_zip(path)
+    if ext == ".pdf":
+        tables = extract_pdf(path, pdf_pages).tables
+        return {name: pd.concat(tables, ignore_index=True)} if tables else {}
+    with open(path, "rb") as fh:
+        return _read_stream(fh, ext, name)
+
+
+# ----------------------------------------------------------------------
+# per-solve registry
+# ----------------------------------------------------------------------
+class DatasetRegistry:
+    """
+    Every table of every attachment seen during one solve. Each file is
+    parsed once; Excel/JSON/ZIP/PDF tables come from the process-wide
+    FrameCache when the same content was parsed before. CSV files stay
+    LazyDatasets so single-table questions can still stream.
+    """
+
+    def __init__(self):
+        self._by_file: Dict[Tuple[str, Tuple[int, ...], Optional[str]], Dict[str, LazyDataset]] = {}
+        self._lock = threading.Lock()
+
+    def _parse(self, path: str, pdf_pages: Optional[List[int]], name: Optional[str]) -> Dict[str, LazyDataset]:
+        ext = Path(path).suffix.lower()
+        if ext == ".csv":
+            ds = LazyDataset(path)
+            ds.preview()
+            return {table_name(Path(name or path).stem): ds}
+        # table names come from the original name, so it is part of the key
+        key = f"{content_key(path)}:{table_name(Path(name or path).stem)}"
+        if ext == ".pdf" and pdf_pages:
+            key += ":" + ",".join(map(str, pdf_pages))
+        cache = get_frame_cache()
+        frames = cache.get(key)
+        if frames is None:
+            frames = {t: df for t, df in parse_tables(path, pdf_pages, name).items() if len(df.columns)}
+            cache.set(key, frames)
+        return {t: LazyDataset.from_frame(df, key=f"{key}:{t}") for t, df in frames.items()}
+
+    def add_file(self, path: str, pdf_pages: Optional[List[int]] = None,
+                 name: Optional[str] = None) -> Dict[str, LazyDataset]:
+        """
+        The tables in ``path`` (parsed on first sight); empty for non-tabular
+        or unreadable files. ``name`` is the file's original name: downloaded
+        files are stored under their content hash, which says nothing to the
+        model, so tables are named after it when given.
+        """
+        # a later step may ask for other PDF pages of the same file
+        memo = (path, tuple(pdf_pages or ()), name)
+        with self._lock:
+            if memo in self._by_file:
+                return self._by_file[memo]
+        tables: Dict[str, LazyDataset] = {}
+        if path.lower().endswith(TABLE_EXTENSIONS):
+            try:
+                with span("parse_file", kind=Path(path).suffix.lower().lstrip(".")):
+                    tables = self._parse(path, pdf_pages, name)
+            except Exception as e:
+                log.warning("file parse error %s: %s", path, e)
+        with self._lock:
+            self._by_file[memo] = tables
+        return tables
+
+    def tables_for(self, files: List[str], pdf_pages: Optional[List[int]] = None,
+                   names: Optional[Dict[str, str]] = None) -> Dict[str, LazyDataset]:
+        """
+        Tables of ``files`` in file order, named after ``names[path]`` (the
+        original file names) where given; clashing names get a _2, _3, ... suffix.
+        """
+        names = names or {}
+        out: Dict[str, LazyDataset] = {}
+        for f in files:
+            for name, ds in self.add_file(f, pdf_pages, names.get(f)).items():
+                unique, n = name, 1
+                while unique in out:
+                    n += 1
+                    unique = f"{name}_{n}"
+                out[unique] = ds
+        return out
@@ -0,0 +1,68 @@
+import asyncio
+import time
+from typing import Awaitable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class Deadline:
+    """
+    Wall-clock budget for one solve, passed down to every network, browser and
+    LLM call so each one gets a timeout carved from what is left.
+    """
+
+    def __init__(self, seconds: float):
+        self.total = float(seconds)
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + self.total
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def is_short(self, seconds: float) -> bool:
+        return self.remaining() < seconds
+
+    def check(self):
+        if self.expired:
+            raise DeadlineExceeded(f"deadline of {self.total:.0f}s exceeded")
+
+    def timeout(self, cap: Optional[float] = None, reserve: float = 0.0) -> float:
+        """
+        Seconds an operation may take: what is left minus ``reserve`` (time
+        kept back for later stages, e.g. the submit), capped at ``cap``.
+        """
+        left = self.remaining() - reserve
+        if left <= 0:
+            raise DeadlineExceeded(f"no time left (reserve {reserve:.1f}s)")
+        return left if cap is None else min(cap, left)
+
+    async def run(self, aw: Awaitable[T], cap: Optional[float] = None, reserve: float = 0.0) -> T:
+        """Await ``aw``, cancelling it when its share of the budget runs out."""
+        try:
+            timeout = self.timeout(cap, reserve)
+        except DeadlineExceeded:
+            if asyncio.iscoroutine(aw):
+                aw.close()
+            raise
+        try:
+            return await asyncio.wait_for(aw, timeout=timeout)
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(f"timed out with {self.remaining():.1f}s left")
+
+
+def timeout_for(deadline: Optional[Deadline], default: float, reserve: float = 0.0) -> float:
+    """``default`` when there is no deadline, otherwise the deadline's share of it."""
+    if deadline is None:
+        return default
+    return deadline.timeout(default, reserve)
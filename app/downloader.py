@@ -0,0 +1,300 @@
+import asyncio
+import base64
+import hashlib
+import itertools
+import mimetypes
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import unquote, urlparse
+
+from app.deadline import Deadline, timeout_for
+from app.http_client import get_async_client
+from app.log import get_logger
+
+from dotenv import load_dotenv
+load_dotenv()
+
+log = get_logger("downloader")
+
+DOWNLOAD_DIR = os.getenv("DOWNLOAD_DIR", "/temp/llm_quiz_file")
+DOWNLOAD_PER_HOST_LIMIT = int(os.getenv("DOWNLOAD_PER_HOST_LIMIT", "4"))
+DOWNLOAD_DISK_BUDGET_MB = float(os.getenv("DOWNLOAD_DISK_BUDGET_MB", "1024"))
+# entries fetched this recently are reused without a revalidation request
+DOWNLOAD_FRESH_SECONDS = float(os.getenv("DOWNLOAD_FRESH_SECONDS", "60"))
+DOWNLOAD_TIMEOUT = float(os.getenv("DOWNLOAD_TIMEOUT", "30"))
+# bytes buffered in memory before a write is handed to a worker thread
+DOWNLOAD_WRITE_BUFFER = 1024 * 1024
+
+# start times of the solves running in this process; objects they may still
+# be reading (used since the oldest of them began) are never evicted
+_solves: Dict[int, float] = {}
+_solve_ids = itertools.count()
+_solves_lock = threading.Lock()
+
+
+def begin_solve() -> int:
+    token = next(_solve_ids)
+    with _solves_lock:
+        _solves[token] = time.time()
+    return token
+
+
+def end_solve(token: int):
+    with _solves_lock:
+        _solves.pop(token, None)
+
+
+def _in_use_since() -> Optional[float]:
+    with _solves_lock:
+        return min(_solves.values(), default=None)
+
+
+class DownloadCache:
+    """
+    Content-addressed store for downloaded attachments.
+
+    Bodies live in ``<root>/objects/<sha256><ext>`` so identical files are
+    stored once and identical names from different quizzes never collide.
+    A small SQLite index maps each URL to its object plus the ETag /
+    Last-Modified validators used for conditional re-fetches, and records
+    last use so the store can be trimmed LRU-first to ``budget_bytes``.
+    """
+
+    def __init__(self, root: str = DOWNLOAD_DIR, budget_bytes: int = int(DOWNLOAD_DISK_BUDGET_MB * 1024 * 1024)):
+        self.root = Path(root)
+        self.objects = self.root / "objects"
+        self.tmp = self.root / "tmp"
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.tmp.mkdir(parents=True, exist_ok=True)
+        self.budget_bytes = budget_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.root / "index.sqlite3"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " url TEXT PRIMARY KEY, sha TEXT NOT NULL, path TEXT NOT NULL,"
+            " etag TEXT, last_modified TEXT, size INTEGER NOT NULL,"
+            " fetched_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def lookup(self, url: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT sha, path, etag, last_modified, size, fetched_at FROM entries WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        entry = dict(zip(("sha", "path", "etag", "last_modified", "size", "fetched_at"), row))
+        if not os.path.exists(entry["path"]):
+            self.forget(url)
+            return None
+        return entry
+
+    def touch(self, url: str, revalidated: bool = False):
+        now = time.time()
+        with self._lock:
+            if revalidated:
+                self._db.execute("UPDATE entries SET last_used = ?, fetched_at = ? WHERE url = ?", (now, now, url))
+            else:
+                self._db.execute("UPDATE entries SET last_used = ? WHERE url = ?", (now, url))
+            self._db.commit()
+
+    def forget(self, url: str):
+        with self._lock:
+            self._db.execute("DELETE FROM entries WHERE url = ?", (url,))
+            self._db.commit()
+
+    def new_temp_path(self) -> str:
+        return str(self.tmp / uuid.uuid4().hex)
+
+    def commit(self, url: str, tmp_path: str, sha: str, ext: str, etag: Optional[str], last_modified: Optional[str]) -> str:
+        """Move a finished temp file into the object store and index it."""
+        path = str(self.objects / f"{sha}{ext}")
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, path)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (url, sha, path, etag, last_modified, size, fetched_at, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, sha, path, etag, last_modified, os.path.getsize(path), now, now),
+            )
+            self._db.commit()
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep: Optional[str] = None):
+        """
+        Drop least recently used objects until the store fits the budget.
+        Objects used since the oldest running solve began are skipped, so a
+        path another solve has just been handed is not deleted under it.
+        """
+        in_use_since = _in_use_since()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT path, MAX(last_used), MAX(size) FROM entries GROUP BY path ORDER BY MAX(last_used) ASC"
+            ).fetchall()
+            total = sum(r[2] for r in rows)
+            for path, last_used, size in rows:
+                if total <= self.budget_bytes:
+                    break
+                if path == keep or (in_use_since is not None and last_used >= in_use_since):
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                self._db.execute("DELETE FROM entries WHERE path = ?", (path,))
+                total -= size
+            self._db.commit()
+
+
+_cache: Optional[DownloadCache] = None
+_cache_lock = threading.Lock()
+_host_limits: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = weakref.WeakKeyDictionary()
+
+
+def get_download_cache() -> DownloadCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DownloadCache()
+        return _cache
+
+
+def _host_semaphore(url: str) -> asyncio.Semaphore:
+    # semaphores are bound to the loop they are used on
+    per_loop = _host_limits.setdefault(asyncio.get_running_loop(), {})
+    host = urlparse(url).netloc
+    sem = per_loop.get(host)
+    if sem is None:
+        sem = asyncio.Semaphore(DOWNLOAD_PER_HOST_LIMIT)
+        per_loop[host] = sem
+    return sem
+
+
+def filename(url: str) -> str:
+    """
+    The name ``url`` gives its file (last path segment, percent-decoded),
+    or its host when the path has none. Stored objects are named by content
+    hash, so this is what callers show instead.
+    """
+    parts = urlparse(url)
+    return unquote(parts.path.rsplit("/", 1)[-1]) or parts.netloc
+
+
+def _extension(url: str) -> str:
+    name = urlparse(url).path.rsplit("/", 1)[-1]
+    ext = Path(name).suffix.lower()
+    return ext if re.fullmatch(r"\.[a-z0-9]{1,8}", ext) else ".bin"
+
+
+async def _write_body(r, tmp_path: str) -> str:
+    """Stream a response body to ``tmp_path`` off the event loop; returns its sha256."""
+    digest = hashlib.sha256()
+    f = await asyncio.to_thread(open, tmp_path, "wb")
+    try:
+        buffer, buffered = [], 0
+        async for chunk in r.aiter_bytes(chunk_size=65536):
+            if chunk:
+                digest.update(chunk)
+                buffer.append(chunk)
+                buffered += len(chunk)
+                if buffered >= DOWNLOAD_WRITE_BUFFER:
+                    await asyncio.to_thread(f.writelines, buffer)
+                    buffer, buffered = [], 0
+        if buffer:
+            await asyncio.to_thread(f.writelines, buffer)
+    finally:
+        await asyncio.to_thread(f.close)
+    return digest.hexdigest()
+
+
+async def fetch(url: str, deadline: Optional[Deadline] = None) -> str:
+    """
+    Return a local path for ``url``, downloading or revalidating as needed.
+    Index lookups, file writes and eviction run in worker threads, never on
+    the event loop.
+    """
+    cache = get_download_cache()
+    entry = await asyncio.to_thread(cache.lookup, url)
+    if entry and time.time() - entry["fetched_at"] < DOWNLOAD_FRESH_SECONDS:
+        await asyncio.to_thread(cache.touch, url)
+        return entry["path"]
+
+    headers = {}
+    if entry:
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    async with _host_semaphore(url):
+        async with get_async_client().stream("GET", url, headers=headers,
+                                            timeout=timeout_for(deadline, DOWNLOAD_TIMEOUT)) as r:
+            if entry and r.status_code == 304:
+                await asyncio.to_thread(cache.touch, url, True)
+                return entry["path"]
+            r.raise_for_status()
+            tmp_path = cache.new_temp_path()
+            try:
+                sha = await _write_body(r, tmp_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            etag = r.headers.get("etag")
+            last_modified = r.headers.get("last-modified")
+
+    return await asyncio.to_thread(cache.commit, url, tmp_path, sha, _extension(url), etag, last_modified)
+
+
+def store_data_uri(uri: str) -> str:
+    """
+    Save an inline ``data:<mime>;base64,...`` attachment into the store and
+    return its path. The content hash doubles as the index key.
+    """
+    header, _, payload = uri.partition(",")
+    data = base64.b64decode(payload)
+    sha = hashlib.sha256(data).hexdigest()
+    ext = mimetypes.guess_extension(header[5:].split(";", 1)[0]) or ""
+    cache = get_download_cache()
+    key = f"data:{sha}"
+    entry = cache.lookup(key)
+    if entry:
+        cache.touch(key)
+        return entry["path"]
+    tmp_path = cache.new_temp_path()
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    return cache.commit(key, tmp_path, sha, ext, None, None)
+
+
+async def fetch_all(urls: List[str], deadline: Optional[Deadline] = None) -> List[str]:
+    """
+    Download every URL in parallel (deduplicated, order preserved). Failures
+    are logged and skipped. With a deadline, downloads still running when it
+    expires are cancelled.
+    """
+    unique = list(dict.fromkeys(urls))
+    if deadline is None:
+        jobs = [fetch(u) for u in unique]
+    else:
+        jobs = [deadline.run(fetch(u, deadline)) for u in unique]
+    results = await asyncio.gather(*jobs, return_exceptions=True)
+    saved = []
+    for url, res in zip(unique, results):
+        if isinstance(res, BaseException):
+            log.warning("download failed %s: %s", url, res)
+        else:
+            saved.append(res)
+    return saved
@@ -0,0 +1,451 @@
+import ast
+import math
+import operator
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.dataset import REDUCTIONS, LazyDataset
+from app.dataset_registry import content_key
+
+from dotenv import load_dotenv
+load_dotenv()
+
+EXPR_CACHE_MAX_ENTRIES = int(os.getenv("EXPR_CACHE_MAX_ENTRIES", "256"))
+
+
+class ExpressionError(ValueError):
+    pass
+
+
+# ----------------------------------------------------------------------
+# what an expression may touch
+# ----------------------------------------------------------------------
+_METHODS = {
+    # reductions
+    "sum", "mean", "median", "min", "max", "count", "nunique", "std", "var", "prod", "quantile", "mode",
+    "idxmax", "idxmin", "any", "all", "first", "last", "size", "describe",
+    # shaping
+    "head", "tail", "sort_values", "sort_index", "nlargest", "nsmallest", "value_counts", "unique",
+    "drop_duplicates", "dropna", "fillna", "reset_index", "set_index", "rename", "tolist", "to_list", "to_dict",
+    "groupby", "agg", "aggregate", "cumsum", "diff", "pct_change", "round", "abs", "clip",
+    # combining tables
+    "merge", "join", "map",
+    # element-wise
+    "isin", "between", "isna", "notna", "isnull", "notnull", "astype", "where", "mask", "replace",
+    # .str accessor
+    "contains", "startswith", "endswith", "lower", "upper", "strip", "len", "split", "get", "slice",
+    "extract", "match", "title", "zfill",
+    # .dt accessor
+    "strftime", "normalize", "day_name", "month_name",
+}
+_PROPERTIES = {
+    "str", "dt", "loc", "iloc", "shape", "columns", "index", "values", "empty", "T",
+    "year", "month", "day", "hour", "minute", "second", "dayofweek", "weekday", "dayofyear", "quarter",
+    "date", "days", "is_month_end", "is_month_start",
+}
+_MODULES = {
+    "pd": (pd, {"to_datetime", "to_numeric", "Timestamp", "Timedelta", "isna", "notna", "NaT", "merge", "concat"}),
+    "np": (np, {"abs", "sqrt", "log", "log10", "log2", "exp", "round", "floor", "ceil", "where", "nan",
+                "mean", "median", "sum", "std", "var", "min", "max", "inf", "pi"}),
+}
+_BUILTINS = {f.__name__: f for f in (len, abs, round, min, max, sum, int, float, str, bool, sorted, list)}
+# string arguments to agg()/aggregate() must name one of these
+_AGG_NAMES = set(REDUCTIONS) | {"median", "nunique", "std", "var", "prod", "first", "last", "size"}
+
+_BINOPS = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod, ast.Pow: operator.pow,
+    ast.BitAnd: operator.and_, ast.BitOr: operator.or_, ast.BitXor: operator.xor,
+}
+_CMPOPS = {
+    ast.Eq: operator.eq, ast.NotEq: operator.ne, ast.Lt: operator.lt, ast.LtE: operator.le,
+    ast.Gt: operator.gt, ast.GtE: operator.ge,
+}
+_CONSTANT_TYPES = (str, int, float, bool, type(None))
+
+
+class _Module:
+    """An allowed module, restricted to its allowed attributes."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.module, self.attrs = _MODULES[name]
+
+
+def _vectorised(*values) -> bool:
+    return any(isinstance(v, (pd.Series, pd.DataFrame, np.ndarray)) for v in values)
+
+
+def _logical_and(a, b):
+    return a & b if _vectorised(a, b) else (a and b)
+
+
+def _logical_or(a, b):
+    return a | b if _vectorised(a, b) else (a or b)
+
+
+def _logical_not(a):
+    return ~a if _vectorised(a) else (not a)
+
+
+def _power(a, b):
+    if isinstance(b, (int, float)) and abs(b) > 64:
+        raise ExpressionError("exponent too large")
+    return a ** b
+
+
+def _get_attribute(obj, attr: str):
+    if isinstance(obj, _Module):
+        if attr not in obj.attrs:
+            raise ExpressionError(f"{obj.name}.{attr} is not allowed")
+        return getattr(obj.module, attr)
+    if attr in _METHODS or attr in _PROPERTIES:
+        return getattr(obj, attr)
+    # df.column shorthand, only for real columns
+    if isinstance(obj, pd.DataFrame) and attr in obj.columns:
+        return obj[attr]
+    raise ExpressionError(f"attribute {attr!r} is not allowed")
+
+
+def _check_agg_spec(spec):
+    if isinstance(spec, str):
+        if spec not in _AGG_NAMES:
+            raise ExpressionError(f"aggregation {spec!r} is not allowed")
+    elif isinstance(spec, (list, tuple)):
+        for s in spec:
+            _check_agg_spec(s)
+    elif isinstance(spec, dict):
+        for s in spec.values():
+            _check_agg_spec(s)
+    elif not callable(spec) or spec not in _BUILTINS.values():
+        raise ExpressionError("aggregation must be named")
+
+
+class Tables(Mapping):
+    """``tables['name']`` inside expressions: every table of the step, loaded on first use."""
+
+    def __init__(self, datasets: Dict[str, LazyDataset]):
+        self._datasets = datasets
+        self._loaded: Dict[str, pd.DataFrame] = {}
+
+    def __getitem__(self, name: str) -> pd.DataFrame:
+        if name not in self._datasets:
+            raise ExpressionError(f"unknown table {name!r}; tables are {sorted(self._datasets)}")
+        if name not in self._loaded:
+            self._loaded[name] = self._datasets[name].load()
+        return self._loaded[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._datasets)
+
+    def __len__(self) -> int:
+        return len(self._datasets)
+
+
+# ----------------------------------------------------------------------
+# compiler: AST -> closure tree over {"df": frame, "tables": Tables}
+# ----------------------------------------------------------------------
+Fn = Callable[[Dict[str, Any]], Any]
+
+
+def _compile(node: ast.AST) -> Fn:
+    if isinstance(node, ast.Expression):
+        return _compile(node.body)
+
+    if isinstance(node, ast.Constant):
+        if not isinstance(node.value, _CONSTANT_TYPES):
+            raise ExpressionError(f"constant {node.value!r} is not allowed")
+        value = node.value
+        return lambda env: value
+
+    if isinstance(node, ast.Name):
+        name = node.id
+        if name == "df":
+            return lambda env: env["df"]
+        if name == "tables":
+            return lambda env: env["tables"]
+        if name in _MODULES:
+            module = _Module(name)
+            return lambda env: module
+        if name in _BUILTINS:
+            fn = _BUILTINS[name]
+            return lambda env: fn
+        raise ExpressionError(f"name {name!r} is not allowed")
+
+    if isinstance(node, (ast.List, ast.Tuple)):
+        items = [_compile(e) for e in node.elts]
+        container = list if isinstance(node, ast.List) else tuple
+        return lambda env: container(f(env) for f in items)
+
+    if isinstance(node, ast.Dict):
+        if any(k is None for k in node.keys):
+            raise ExpressionError("dict unpacking is not allowed")
+        keys = [_compile(k) for k in node.keys]
+        values = [_compile(v) for v in node.values]
+        return lambda env: {k(env): v(env) for k, v in zip(keys, values)}
+
+    if isinstance(node, ast.Attribute):
+        if node.attr.startswith("_"):
+            raise ExpressionError(f"attribute {node.attr!r} is not allowed")
+        base, attr = _compile(node.value), node.attr
+        return lambda env: _get_attribute(base(env), attr)
+
+    if isinstance(node, ast.Subscript):
+        base, key = _compile(node.value), _compile(node.slice)
+        return lambda env: base(env)[key(env)]
+
+    if isinstance(node, ast.Slice):
+        parts = [_compile(p) if p is not None else (lambda env: None) for p in (node.lower, node.upper, node.step)]
+        return lambda env: slice(*(p(env) for p in parts))
+
+    if isinstance(node, ast.BinOp):
+        op = _power if isinstance(node.op, ast.Pow) else _BINOPS.get(type(node.op))
+        if op is None:
+            raise ExpressionError(f"operator {type(node.op).__name__} is not allowed")
+        left, right = _compile(node.left), _compile(node.right)
+        return lambda env: op(left(env), right(env))
+
+    if isinstance(node, ast.UnaryOp):
+        operand = _compile(node.operand)
+        if isinstance(node.op, ast.USub):
+            return lambda env: -operand(env)
+        if isinstance(node.op, ast.UAdd):
+            return lambda env: +operand(env)
+        if isinstance(node.op, ast.Invert):
+            return lambda env: ~operand(env)
+        return lambda env: _logical_not(operand(env))
+
+    if isinstance(node, ast.BoolOp):
+        # "and"/"or" on columns mean element-wise & / |
+        combine = _logical_and if isinstance(node.op, ast.And) else _logical_or
+        values = [_compile(v) for v in node.values]
+
+        def run(env):
+            result = values[0](env)
+            for v in values[1:]:
+                result = combine(result, v(env))
+            return result
+        return run
+
+    if isinstance(node, ast.Compare):
+        ops = []
+        for op in node.ops:
+            if type(op) not in _CMPOPS:
+                raise ExpressionError(f"comparison {type(op).__name__} is not allowed")
+            ops.append(_CMPOPS[type(op)])
+        operands = [_compile(node.left)] + [_compile(c) for c in node.comparators]
+
+        def run(env):
+            # a < b < c is evaluated pairwise and combined element-wise
+            values = [f(env) for f in operands]
+            result = None
+            for op, a, b in zip(ops, values, values[1:]):
+                r = op(a, b)
+                result = r if result is None else _logical_and(result, r)
+            return result
+        return run
+
+    if isinstance(node, ast.IfExp):
+        test, body, orelse = _compile(node.test), _compile(node.body), _compile(node.orelse)
+        return lambda env: body(env) if test(env) else orelse(env)
+
+    if isinstance(node, ast.Call):
+        if isinstance(node.func, ast.Attribute):
+            # module functions are checked against the module's own list
+            on_module = isinstance(node.func.value, ast.Name) and node.func.value.id in _MODULES
+            if not on_module and node.func.attr not in _METHODS:
+                raise ExpressionError(f"method {node.func.attr!r} is not allowed")
+        elif not (isinstance(node.func, ast.Name) and node.func.id in _BUILTINS):
+            raise ExpressionError("only whitelisted functions and methods may be called")
+        func = _compile(node.func)
+        args = [_compile(a) for a in node.args]
+        if any(k.arg is None for k in node.keywords):
+            raise ExpressionError("keyword unpacking is not allowed")
+        kwargs = [(k.arg, _compile(k.value)) for k in node.keywords]
+        is_agg = isinstance(node.func, ast.Attribute) and node.func.attr in ("agg", "aggregate")
+
+        def run(env):
+            fn = func(env)
+            a = [f(env) for f in args]
+            kw = {name: f(env) for name, f in kwargs}
+            if is_agg:
+                for spec in a:
+                    _check_agg_spec(spec)
+                for spec in kw.values():
+                    # named aggregation: total=("col", "sum")
+                    _check_agg_spec(spec[1] if isinstance(spec, tuple) and len(spec) == 2 else spec)
+            return fn(*a, **kw)
+        return run
+
+    raise ExpressionError(f"{type(node).__name__} is not allowed")
+
+
+# ----------------------------------------------------------------------
+# plans
+# ----------------------------------------------------------------------
+class Plan:
+    """
+    A compiled expression. ``columns`` are the string literals the
+    expression mentions; when every use of ``df`` is a ``df[...]`` lookup
+    (``prunable``) only those columns need to be read. ``streaming`` is set
+    for the shapes LazyDataset can answer chunk by chunk. ``uses_tables``
+    when the expression reaches other tables through ``tables[...]``.
+    """
+
+    def __init__(self, expr: str, fn: Fn, columns: List[str], prunable: bool, streaming: Optional[Tuple],
+                 uses_tables: bool = False):
+        self.expr = expr
+        self.fn = fn
+        self.columns = columns
+        self.prunable = prunable
+        self.streaming = streaming
+        self.uses_tables = uses_tables
+
+
+def _streaming_shape(node: ast.AST) -> Optional[Tuple]:
+    """("reduce", col, op) for df['c'].op(), ("groupby", by, col, op) for df.groupby('k')['c'].op()."""
+    if not (isinstance(node, ast.Call) and not node.args and not node.keywords
+            and isinstance(node.func, ast.Attribute) and node.func.attr in REDUCTIONS):
+        return None
+    op, target = node.func.attr, node.func.value
+    if not (isinstance(target, ast.Subscript) and isinstance(target.slice, ast.Constant)
+            and isinstance(target.slice.value, str)):
+        return None
+    column, base = target.slice.value, target.value
+    if isinstance(base, ast.Name) and base.id == "df":
+        return ("reduce", column, op)
+    if (isinstance(base, ast.Call) and isinstance(base.func, ast.Attribute) and base.func.attr == "groupby"
+            and isinstance(base.func.value, ast.Name) and base.func.value.id == "df"
+            and len(base.args) == 1 and not base.keywords
+            and isinstance(base.args[0], ast.Constant) and isinstance(base.args[0].value, str)):
+        return ("groupby", base.args[0].value, column, op)
+    return None
+
+
+@lru_cache(maxsize=EXPR_CACHE_MAX_ENTRIES)
+def compile_expression(expr: str) -> Plan:
+    """Parse and compile ``expr``; raises ExpressionError for anything outside the allowed subset."""
+    try:
+        tree = ast.parse(expr.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ExpressionError(f"syntax error: {e.msg}")
+    fn = _compile(tree)
+
+    columns, df_uses, df_lookups, uses_tables = [], 0, 0, False
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            columns.append(node.value)
+        elif isinstance(node, ast.Name) and node.id == "df":
+            df_uses += 1
+        elif isinstance(node, ast.Name) and node.id == "tables":
+            uses_tables = True
+        elif isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name) and node.value.id == "df":
+            df_lookups += 1
+    prunable = df_uses > 0 and df_uses == df_lookups
+    return Plan(expr, fn, list(dict.fromkeys(columns)), prunable, _streaming_shape(tree.body), uses_tables)
+
+
+# ----------------------------------------------------------------------
+# evaluation + result cache
+# ----------------------------------------------------------------------
+def to_answer(value: Any) -> Any:
+    """Plain JSON-friendly Python values from pandas/NumPy results."""
+    if isinstance(value, pd.DataFrame):
+        return [{str(k): to_answer(v) for k, v in row.items()} for row in value.to_dict(orient="records")]
+    if isinstance(value, pd.Series):
+        return {k if isinstance(k, (str, int, float, bool)) else str(k): to_answer(v) for k, v in value.items()}
+    if isinstance(value, (pd.Index, np.ndarray)):
+        return [to_answer(v) for v in value.tolist()]
+    if isinstance(value, (list, tuple)):
+        return [to_answer(v) for v in value]
+    if isinstance(value, (pd.Timestamp, pd.Timedelta)):
+        return str(value)
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+_results: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+_results_lock = threading.Lock()
+stats = {"hits": 0, "misses": 0}
+
+
+def dataset_key(ds: LazyDataset) -> str:
+    """Content hash of the data behind ``ds`` (memoised per file version)."""
+    if ds.key is not None:
+        return ds.key
+    if ds.path is None:
+        return "frame:%x" % int(pd.util.hash_pandas_object(ds.load(), index=True).sum())
+    return content_key(ds.path)
+
+
+def _can_stream(shape: Tuple, ds: LazyDataset) -> bool:
+    """Chunked reductions only for numeric columns (count works on anything); dates and strings go to pandas."""
+    column, op = shape[-2], shape[-1]
+    return op == "count" or ds.is_numeric(column)
+
+
+def _run(plan: Plan, ds: LazyDataset, tables: Dict[str, LazyDataset]) -> Any:
+    if plan.uses_tables:
+        # joins need whole tables; no pruning or streaming
+        return plan.fn({"df": ds.load(), "tables": Tables(tables)})
+    if plan.streaming is not None and ds.path is not None and _can_stream(plan.streaming, ds):
+        if plan.streaming[0] == "reduce":
+            _, column, op = plan.streaming
+            value = ds.reduce(column, op)
+            return int(value) if op == "count" else value
+        _, by, column, op = plan.streaming
+        return ds.groupby_agg(by, column, op)
+
+    known = set(ds.columns)
+    columns = [c for c in plan.columns if c in known]
+    if plan.prunable and columns:
+        value = plan.fn({"df": ds.load(columns)})
+        if not isinstance(value, pd.DataFrame):
+            return value
+        # a frame result should carry every column, not just the referenced ones
+    return plan.fn({"df": ds.load()})
+
+
+def evaluate(df, expr: str, tables: Optional[Dict[str, LazyDataset]] = None) -> Any:
+    """
+    Evaluate an LLM-written pandas expression over ``df`` (a DataFrame or
+    LazyDataset) without eval(): the expression is compiled from a
+    restricted AST into vectorised pandas calls. ``tables`` are the other
+    tables of the step, reachable as ``tables['name']`` for merges and
+    lookups. Plans are cached per expression and results per (data
+    content, expression).
+    """
+    ds = df if isinstance(df, LazyDataset) else LazyDataset.from_frame(df)
+    plan = compile_expression(expr.strip())
+    tables = tables or {}
+    data_key = dataset_key(ds)
+    if plan.uses_tables:
+        data_key += "|" + ",".join(f"{name}={dataset_key(t)}" for name, t in sorted(tables.items()))
+    key = (data_key, plan.expr)
+    with _results_lock:
+        if key in _results:
+            _results.move_to_end(key)
+            stats["hits"] += 1
+            return _results[key]
+        stats["misses"] += 1
+    try:
+        value = to_answer(_run(plan, ds, tables))
+    except ExpressionError:
+        raise
+    except Exception as e:
+        raise ExpressionError(f"{type(e).__name__}: {e}")
+    with _results_lock:
+        _results[key] = value
+        while len(_results) > EXPR_CACHE_MAX_ENTRIES:
+            _results.popitem(last=False)
+    return value
@@ -1,62 +1,49 @@
-import os
 import pandas as pd
-import pdfplumber
-from typing import List, Dict, Any
-from pathlib import Path
-from PIL import Image
-import pytesseract
+from typing import List, Optional
+from app.dataset import LazyDataset
+from app.dataset_registry import DatasetRegistry
+from app.pdf_engine import extract_pdf
+from app.ocr import ocr_file
 
-def read_csv(path: str) -> pd.DataFrame:
-    return pd.read_csv(path)
+def read_csv(path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    return LazyDataset(path).load(columns)
 
-def read_excel(path: str) -> pd.DataFrame:
+def read_excel(path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
     # returns first sheet by default
-    return pd.read_excel(path)
+    return LazyDataset(path).load(columns)
 
-def read_pdf_tables(path: str) -> List[pd.DataFrame]:
+def read_pdf_tables(path: str, pages: Optional[List[int]] = None) -> List[pd.DataFrame]:
     """
-    Extract tables from PDF using pdfplumber. Return list of dataframes (all pages).
+    Extract tables from PDF. Return list of dataframes (all pages, or the 1-based ``pages``).
+    Shares one cached extraction pass with extract_text_from_pdf.
     """
-    dfs = []
-    with pdfplumber.open(path) as pdf:
-        for page in pdf.pages:
-            tables = page.extract_tables()
-            for table in tables:
-                # convert table (list of lists) to DataFrame
-                if not table:
-                    continue
-                df = pd.DataFrame(table[1:], columns=table[0])
-                dfs.append(df)
-    return dfs
+    return extract_pdf(path, pages).tables
 
-def extract_text_from_pdf(path: str) -> str:
-    text = ""
-    with pdfplumber.open(path) as pdf:
-        for page in pdf.pages:
-            text += page.extract_text() or ""
-    return text
+def extract_text_from_pdf(path: str, pages: Optional[List[int]] = None) -> str:
+    return extract_pdf(path, pages).text
 
 def ocr_image(path: str) -> str:
-    img = Image.open(path)
-    text = pytesseract.image_to_string(img)
-    return text
+    return ocr_file(path)
 
-def find_best_dataframe(files: List[str]):
+def find_best_dataset(files: List[str], pdf_pages: Optional[List[int]] = None,
+                      registry: Optional[DatasetRegistry] = None) -> Optional[LazyDataset]:
     """
-    Heuristic: among downloaded files, return the most promising DataFrame for operations.
+    Heuristic: among downloaded files, return the most promising table for operations
+    (the first table of the first file that has one). CSV files are only opened far
+    enough to read a preview; Excel, JSON, ZIP and PDF files are parsed in full (every
+    sheet, member and table) through the registry's cache. Files after the first hit
+    are not parsed at all.
     """
+    registry = registry or DatasetRegistry()
     for f in files:
-        ext = Path(f).suffix.lower()
-        try:
-            if ext == ".csv":
-                return read_csv(f)
-            elif ext in (".xlsx", ".xls"):
-                return read_excel(f)
-            elif ext == ".pdf":
-                tables = read_pdf_tables(f)
-                if tables:
-                    # return concatenated first table
-                    return pd.concat(tables, ignore_index=True)
-        except Exception as e:
-            print("file parse error", f, e)
+        tables = registry.add_file(f, pdf_pages)
+        if tables:
+            return next(iter(tables.values()))
     return None
+
+def find_best_dataframe(files: List[str]):
+    """
+    Heuristic: among downloaded files, return the most promising DataFrame for operations.
+    """
+    ds = find_best_dataset(files)
+    return ds.load() if ds is not None else None
@@ -0,0 +1,173 @@
+import html as htmllib
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+# attachments the solver downloads and parses
+DATA_EXTENSIONS = (".csv", ".pdf", ".xlsx", ".xls", ".json", ".zip")
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".bmp", ".tif", ".tiff", ".webp")
+ATTACHMENT_EXTENSIONS = DATA_EXTENSIONS + IMAGE_EXTENSIONS
+# reported, but not downloaded
+MEDIA_EXTENSIONS = (".mp3", ".wav", ".ogg", ".m4a", ".flac", ".opus", ".mp4", ".webm")
+
+
+def _ext_alternation(exts) -> str:
+    return "|".join(re.escape(e.lstrip(".")) for e in sorted(exts, key=len, reverse=True))
+
+
+# Each pattern starts with a literal ("=", "http", "data:", "<div"), which
+# lets the regex engine skip ahead at C speed and hand Python only the few
+# interesting matches. (A single alternation of all of them defeats that
+# prefix scan and was measured 3-4x slower on large pages, see
+# benchmarks/html_extract_bench.py.)
+_ATTR_VALUE_RE = re.compile(
+    r"""=\s*["']?(?P<val>[^\s"'<>`]*?(?:\.(?i:%s)(?:[?\#][^\s"'<>`]*)?(?=[\s"'<>`]|$)|submit[^\s"'<>`]*))"""
+    % _ext_alternation(ATTACHMENT_EXTENSIONS + MEDIA_EXTENSIONS)
+)
+_ABS_URL_RE = re.compile(r"""https?://[^\s'"<>`)]+""")
+_DATA_URI_RE = re.compile(r"data:[\w.+-]+/[\w.+-]+(?:;[\w.+=-]+)*;base64,[A-Za-z0-9+/=]+")
+_REL_SUBMIT_RE = re.compile(r"""(?:^|[\s"'(=>`])(/[\w\-./]*submit[\w\-./?=&%]*)""")
+_RESULT_RE = re.compile(r"""<div\b[^>]*\bid\s*=\s*["']?result\b[^>]*>""", re.IGNORECASE)
+_PRE_RE = re.compile(r"<pre\b[^>]*>(.*?)</pre\s*>", re.IGNORECASE | re.DOTALL)
+_DIV_RE = re.compile(r"<(/?)(?i:div)\b[^>]*>")
+_LINKED_EXTENSIONS = ATTACHMENT_EXTENSIONS + MEDIA_EXTENSIONS
+_ATTR_NAME_RE = re.compile(r"([\w:-]+)\s*$")
+# attributes whose value is a URL; type/id/name/class values such as
+# type="submit" or id="submit-btn" are never endpoints
+_URL_ATTRS = ("action", "formaction", "href")
+_NON_URL_ATTRS = ("type", "id", "name", "class", "value", "role")
+_TAG_RE = re.compile(r"<[^>]+>")
+_BLOCK_RE = re.compile(r"<(?:br|/?(?:p|div|li|tr|h[1-6]|table|ul|ol))\b[^>]*>", re.IGNORECASE)
+_SPACE_RE = re.compile(r"[ \t\r\f\v]+")
+
+
+class PageExtraction:
+    def __init__(self):
+        self.question: str = ""
+        self.submit_url: Optional[str] = None
+        self.attachments: List[str] = []
+        self.media: List[str] = []
+        self.data_uris: List[str] = []
+
+    def as_dict(self) -> Dict:
+        return {
+            "question": self.question,
+            "submit_url": self.submit_url,
+            "attachments": self.attachments,
+            "media": self.media,
+            "data_uris": [u[:64] + "..." if len(u) > 64 else u for u in self.data_uris],
+        }
+
+
+def _text(fragment: str) -> str:
+    text = htmllib.unescape(_TAG_RE.sub("", _BLOCK_RE.sub("\n", fragment)))
+    lines = (_SPACE_RE.sub(" ", line).strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def _absolute(link: str, base_url: Optional[str]) -> str:
+    link = htmllib.unescape(link.strip())
+    if base_url:
+        if link.startswith("//"):
+            return f"{urlparse(base_url).scheme}:{link}"
+        if not urlparse(link).netloc:
+            return urljoin(base_url, link)
+    return link
+
+
+def _ext(link: str) -> str:
+    path = urlparse(link).path.lower()
+    dot = path.rfind(".")
+    return path[dot:] if dot != -1 else ""
+
+
+def _attr_name(html: str, eq: int) -> str:
+    """Lower-cased name of the attribute whose "=" sits at ``eq``."""
+    m = _ATTR_NAME_RE.search(html, max(0, eq - 40), eq)
+    return m.group(1).lower() if m else ""
+
+
+def _matching_div_end(html: str, start: int) -> int:
+    """Offset of the </div> that closes a div opened just before ``start``."""
+    depth = 1
+    for m in _DIV_RE.finditer(html, start):
+        depth += -1 if m.group(1) else 1
+        if depth == 0:
+            return m.start()
+    return len(html)
+
+
+def result_text(html: str) -> Optional[str]:
+    """Text inside the #result container (nesting-aware); None when the page has none."""
+    m = _RESULT_RE.search(html)
+    return _text(html[m.end():_matching_div_end(html, m.end())]) if m else None
+
+
+@lru_cache(maxsize=32)
+def extract_page(html: str, base_url: Optional[str] = None) -> PageExtraction:
+    """
+    Find everything the solver needs from a page in one call: the question
+    (#result, else the first <pre>), the submit endpoint (absolute, form
+    action or relative path), every attachment and media link (quoted or
+    unquoted attributes, plus absolute URLs in scripts/text) and inline data
+    URIs. Results are memoised, so callers may ask repeatedly for the same
+    page.
+    """
+    out = PageExtraction()
+    attachments: Dict[str, None] = {}
+    media: Dict[str, None] = {}
+
+    def add_link(link: str):
+        # cheap suffix test on the raw value before any URL parsing
+        bare = link.split("#", 1)[0].split("?", 1)[0].lower()
+        if not bare.endswith(_LINKED_EXTENSIONS):
+            return
+        link = _absolute(link, base_url)
+        if bare.endswith(ATTACHMENT_EXTENSIONS):
+            attachments.setdefault(link)
+        else:
+            media.setdefault(link)
+
+    # question: the #result container (nesting-aware), else the first <pre>
+    out.question = result_text(html) or ""
+    if not out.question:
+        m = _PRE_RE.search(html)
+        if m:
+            # fallback: first <pre> contents
+            out.question = _text(m.group(1))
+
+    submit_abs = submit_attr = None
+    for m in _ATTR_VALUE_RE.finditer(html):
+        value = m.group("val")
+        if value.startswith("data:"):
+            continue
+        if "submit" in value and not _ext(value):
+            attr = _attr_name(html, m.start())
+            if attr in _URL_ATTRS or ("/" in value and attr not in _NON_URL_ATTRS):
+                # a form action wins over a plain link
+                if submit_attr is None or attr in ("action", "formaction"):
+                    submit_attr = value
+        else:
+            add_link(value)
+    for m in _ABS_URL_RE.finditer(html):
+        url = m.group(0).rstrip(".,;")
+        if submit_abs is None and "/submit" in url:
+            submit_abs = url
+        else:
+            add_link(url)
+    out.data_uris = list(dict.fromkeys(_DATA_URI_RE.findall(html))) if "data:" in html else []
+
+    submit = submit_abs or submit_attr
+    if submit is None:
+        m = _REL_SUBMIT_RE.search(html)
+        submit = m.group(1) if m else None
+    out.submit_url = _absolute(submit, base_url) if submit else None
+    out.attachments = list(attachments)
+    out.media = list(media)
+    return out
+
+
+def find_submit_and_question(html: str, base_url: Optional[str] = None) -> Tuple[Optional[str], str]:
+    page = extract_page(html, base_url)
+    return page.submit_url, page.question
@@ -0,0 +1,57 @@
+import asyncio
+import os
+import weakref
+from typing import Optional
+
+import httpx
+
+from dotenv import load_dotenv
+load_dotenv()
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))
+
+# httpx.AsyncClient is bound to the loop it was first used on, so keep one
+# shared client per running loop (normally just uvicorn's).
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Shared keep-alive client for the current event loop. Used for the LLM,
+    downloads and answer submissions.
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS,
+                                max_keepalive_connections=HTTP_MAX_KEEPALIVE),
+        )
+        _clients[loop] = client
+    return client
+
+
+async def close_async_client():
+    """Close the client that belongs to the current loop (called on shutdown)."""
+    loop = asyncio.get_running_loop()
+    client: Optional[httpx.AsyncClient] = _clients.pop(loop, None)
+    if client is not None:
+        await client.aclose()
+
+
+def run_sync(coro):
+    """
+    Drive an async pipeline from blocking code. The coroutine gets its own
+    loop and HTTP client, which are closed when it finishes.
+    """
+    async def _runner():
+        try:
+            return await coro
+        finally:
+            await close_async_client()
+
+    return asyncio.run(_runner())
@@ -0,0 +1,399 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Sequence
+from urllib.parse import urlparse
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# memory://  |  sqlite:///path/to/jobs.sqlite3  |  redis://host:6379/0
+JOB_QUEUE_URL = os.getenv("JOB_QUEUE_URL", "memory://")
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "2"))
+# how many queued jobs a worker looks at when preferring hosts it has served
+JOB_AFFINITY_SCAN = int(os.getenv("JOB_AFFINITY_SCAN", "20"))
+# finished (done/failed) jobs stay pollable this many seconds, then are dropped (0 = keep)
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "3600"))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+def new_job(payload: Dict[str, Any], affinity: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "id": uuid.uuid4().hex,
+        "payload": payload,
+        "affinity": affinity,
+        "status": QUEUED,
+        "attempts": 0,
+        "worker": None,
+        "result": None,
+        "error": None,
+        "created_at": time.time(),
+        "started_at": None,
+        "finished_at": None,
+        "heartbeat_at": None,
+    }
+
+
+def public_view(job: Dict[str, Any]) -> Dict[str, Any]:
+    """A job without its payload (which carries the secret)."""
+    return {k: v for k, v in job.items() if k != "payload"}
+
+
+def _pick(candidates: List[Dict[str, Any]], affinities: Sequence[str]) -> Optional[Dict[str, Any]]:
+    """Oldest job for a host this worker has a warm browser for, else the oldest job."""
+    if not candidates:
+        return None
+    if affinities:
+        for job in candidates:
+            if job.get("affinity") in affinities:
+                return job
+    return candidates[0]
+
+
+def _owned(job: Optional[Dict[str, Any]], worker: str) -> bool:
+    """Only the worker a running job was claimed by may record its outcome."""
+    return job is not None and job["status"] == RUNNING and job["worker"] == worker
+
+
+def _expired(job: Dict[str, Any], cutoff: float) -> bool:
+    return job["status"] in (DONE, FAILED) and (job["finished_at"] or 0) < cutoff
+
+
+def _after_failure(job: Dict[str, Any], error: str, retry: bool) -> Dict[str, Any]:
+    job["error"] = error
+    job["worker"] = None
+    job["heartbeat_at"] = None
+    if retry and job["attempts"] < JOB_MAX_ATTEMPTS:
+        job["status"] = QUEUED
+    else:
+        job["status"] = FAILED
+        job["finished_at"] = time.time()
+    return job
+
+
+class MemoryQueue:
+    """In-process queue; jobs only reach workers running in the same process."""
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._queued: List[str] = []
+        self._lock = threading.Lock()
+
+    def _prune(self):
+        # caller holds the lock
+        if JOB_RESULT_TTL > 0:
+            cutoff = time.time() - JOB_RESULT_TTL
+            for job_id in [i for i, job in self._jobs.items() if _expired(job, cutoff)]:
+                del self._jobs[job_id]
+
+    def put(self, payload: Dict[str, Any], affinity: Optional[str] = None) -> str:
+        job = new_job(payload, affinity)
+        with self._lock:
+            self._prune()
+            self._jobs[job["id"]] = job
+            self._queued.append(job["id"])
+        return job["id"]
+
+    def claim(self, worker: str, affinities: Sequence[str] = ()) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = _pick([self._jobs[i] for i in self._queued[:JOB_AFFINITY_SCAN]], affinities)
+            if job is None:
+                return None
+            self._queued.remove(job["id"])
+            now = time.time()
+            job.update(status=RUNNING, worker=worker, started_at=now, heartbeat_at=now, attempts=job["attempts"] + 1)
+            return dict(job)
+
+    def heartbeat(self, job_id: str, worker: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job and job["worker"] == worker:
+                job["heartbeat_at"] = time.time()
+
+    def complete(self, job_id: str, worker: str, result: Any) -> bool:
+        """Record the result; False (and nothing written) when ``worker`` no longer owns the job."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not _owned(job, worker):
+                return False
+            job.update(status=DONE, result=result, finished_at=time.time(), heartbeat_at=None)
+            return True
+
+    def fail(self, job_id: str, worker: str, error: str, retry: bool = True) -> bool:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not _owned(job, worker):
+                return False
+            if _after_failure(job, error, retry)["status"] == QUEUED:
+                self._queued.append(job_id)
+            return True
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def reap(self, stale_after: float) -> int:
+        """Requeue (or fail) running jobs whose worker stopped heartbeating."""
+        cutoff = time.time() - stale_after
+        with self._lock:
+            stale = [j for j in self._jobs.values() if j["status"] == RUNNING and (j["heartbeat_at"] or 0) < cutoff]
+            for job in stale:
+                if _after_failure(job, f"worker {job['worker']} lost", True)["status"] == QUEUED:
+                    self._queued.append(job["id"])
+        return len(stale)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+            for job in self._jobs.values():
+                counts[job["status"]] += 1
+            return counts
+
+
+class SQLiteQueue:
+    """Queue in a SQLite file, shared by every worker process on the host."""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, status TEXT NOT NULL, affinity TEXT, created_at REAL NOT NULL,"
+            " heartbeat_at REAL, data TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+
+    def _save(self, job: Dict[str, Any]):
+        self._db.execute(
+            "INSERT OR REPLACE INTO jobs (id, status, affinity, created_at, heartbeat_at, data) VALUES (?, ?, ?, ?, ?, ?)",
+            (job["id"], job["status"], job["affinity"], job["created_at"], job["heartbeat_at"], json.dumps(job)),
+        )
+
+    def _load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._db.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _update(self, job_id: str, change, worker: Optional[str] = None) -> bool:
+        # BEGIN IMMEDIATE takes the write lock up front, so read-modify-write
+        # is atomic across processes
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                job = self._load(job_id)
+                changed = job is not None and (worker is None or _owned(job, worker))
+                if changed:
+                    change(job)
+                    self._save(job)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return changed
+
+    def put(self, payload: Dict[str, Any], affinity: Optional[str] = None) -> str:
+        job = new_job(payload, affinity)
+        with self._lock:
+            if JOB_RESULT_TTL > 0:
+                self._db.execute(
+                    "DELETE FROM jobs WHERE status IN (?, ?) AND json_extract(data, '$.finished_at') < ?",
+                    (DONE, FAILED, time.time() - JOB_RESULT_TTL),
+                )
+            self._save(job)
+        return job["id"]
+
+    def claim(self, worker: str, affinities: Sequence[str] = ()) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._db.execute(
+                    "SELECT data FROM jobs WHERE status = ? ORDER BY created_at LIMIT ?", (QUEUED, JOB_AFFINITY_SCAN)
+                ).fetchall()
+                job = _pick([json.loads(r[0]) for r in rows], affinities)
+                if job is not None:
+                    now = time.time()
+                    job.update(status=RUNNING, worker=worker, started_at=now, heartbeat_at=now, attempts=job["attempts"] + 1)
+                    self._save(job)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return job
+
+    def heartbeat(self, job_id: str, worker: str):
+        self._update(job_id, lambda job: job.update(heartbeat_at=time.time()), worker)
+
+    def complete(self, job_id: str, worker: str, result: Any) -> bool:
+        return self._update(job_id, lambda job: job.update(status=DONE, result=result, finished_at=time.time(),
+                                                            heartbeat_at=None), worker)
+
+    def fail(self, job_id: str, worker: str, error: str, retry: bool = True) -> bool:
+        return self._update(job_id, lambda job: _after_failure(job, error, retry), worker)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._load(job_id)
+
+    def reap(self, stale_after: float) -> int:
+        cutoff = time.time() - stale_after
+        with self._lock:
+            ids = [r[0] for r in self._db.execute(
+                "SELECT id FROM jobs WHERE status = ? AND heartbeat_at < ?", (RUNNING, cutoff)).fetchall()]
+
+        def requeue(job):
+            # re-checked under the write lock: the worker may have caught up
+            if job["status"] == RUNNING and (job["heartbeat_at"] or 0) < cutoff:
+                _after_failure(job, f"worker {job['worker']} lost", True)
+
+        for job_id in ids:
+            self._update(job_id, requeue)
+        return len(ids)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+            counts.update(dict(self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()))
+            return counts
+
+
+class RedisQueue:
+    """
+    Queue on any Redis-compatible server (Redis, Valkey, KeyDB, ...), shared
+    by workers on every host. Only plain string, list and set commands and
+    WATCH/MULTI transactions are used. A job is claimed by whichever
+    worker's LREM removes its id; finished jobs expire after JOB_RESULT_TTL.
+    """
+
+    def __init__(self, url: str, prefix: str = "quizjobs"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("JOB_QUEUE_URL is a redis:// URL but the redis package is not installed "
+                               "(pip install redis)")
+        self._r = redis.Redis.from_url(url, decode_responses=True)
+        self._watch_error = redis.WatchError
+        self._prefix = prefix
+
+    def _key(self, *parts: str) -> str:
+        return ":".join((self._prefix,) + parts)
+
+    def _save(self, job: Dict[str, Any], client=None):
+        finished = job["status"] in (DONE, FAILED) and JOB_RESULT_TTL > 0
+        (client or self._r).set(self._key("job", job["id"]), json.dumps(job),
+                                ex=max(1, int(JOB_RESULT_TTL)) if finished else None)
+
+    def _update(self, job_id: str, change, worker: Optional[str] = None, when=None) -> Optional[Dict[str, Any]]:
+        """
+        Check and rewrite one job atomically. The job key is WATCHed, so if
+        the reaper or another worker writes it in between, the transaction is
+        dropped and the check runs again on the new state. Only the owning
+        ``worker`` (or, with ``when``, the reaper) gets past the check. A job
+        leaving RUNNING leaves the running set in the same transaction and is
+        requeued or counted.
+        """
+        key = self._key("job", job_id)
+        with self._r.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    blob = pipe.get(key)
+                    job = json.loads(blob) if blob else None
+                    if job is None or (worker is not None and not _owned(job, worker)) or (when and not when(job)):
+                        return None
+                    change(job)
+                    pipe.multi()
+                    self._save(job, pipe)
+                    if job["status"] != RUNNING:
+                        pipe.srem(self._key("running"), job_id)
+                        if job["status"] == QUEUED:
+                            pipe.rpush(self._key("queued"), job_id)
+                        else:
+                            pipe.incr(self._key("count", job["status"]))
+                    pipe.execute()
+                    return job
+                except self._watch_error:
+                    continue
+
+    def put(self, payload: Dict[str, Any], affinity: Optional[str] = None) -> str:
+        job = new_job(payload, affinity)
+        self._save(job)
+        self._r.rpush(self._key("queued"), job["id"])
+        return job["id"]
+
+    def claim(self, worker: str, affinities: Sequence[str] = ()) -> Optional[Dict[str, Any]]:
+        ids = self._r.lrange(self._key("queued"), 0, JOB_AFFINITY_SCAN - 1)
+        candidates = [j for j in (self.get(i) for i in ids) if j is not None]
+        preferred = _pick(candidates, affinities)
+        for job in ([preferred] if preferred else []) + candidates:
+            if self._r.lrem(self._key("queued"), 1, job["id"]) == 1:
+                now = time.time()
+                job.update(status=RUNNING, worker=worker, started_at=now, heartbeat_at=now, attempts=job["attempts"] + 1)
+                with self._r.pipeline() as pipe:
+                    self._save(job, pipe)
+                    pipe.sadd(self._key("running"), job["id"])
+                    pipe.execute()
+                return job
+        return None
+
+    def heartbeat(self, job_id: str, worker: str):
+        self._update(job_id, lambda job: job.update(heartbeat_at=time.time()), worker)
+
+    def complete(self, job_id: str, worker: str, result: Any) -> bool:
+        return self._update(job_id, lambda job: job.update(status=DONE, result=result, finished_at=time.time(),
+                                                           heartbeat_at=None), worker) is not None
+
+    def fail(self, job_id: str, worker: str, error: str, retry: bool = True) -> bool:
+        return self._update(job_id, lambda job: _after_failure(job, error, retry), worker) is not None
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        blob = self._r.get(self._key("job", job_id))
+        return json.loads(blob) if blob else None
+
+    def reap(self, stale_after: float) -> int:
+        cutoff = time.time() - stale_after
+
+        def stale(job):
+            return job["status"] == RUNNING and (job["heartbeat_at"] or 0) < cutoff
+
+        reaped = 0
+        for job_id in self._r.smembers(self._key("running")):
+            if self._update(job_id, lambda job: _after_failure(job, f"worker {job['worker']} lost", True),
+                            when=stale) is not None:
+                reaped += 1
+        return reaped
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            QUEUED: self._r.llen(self._key("queued")),
+            RUNNING: self._r.scard(self._key("running")),
+            DONE: int(self._r.get(self._key("count", DONE)) or 0),
+            FAILED: int(self._r.get(self._key("count", FAILED)) or 0),
+        }
+
+
+def open_queue(url: str = JOB_QUEUE_URL):
+    scheme = urlparse(url).scheme
+    if scheme == "memory":
+        return MemoryQueue()
+    if scheme == "sqlite":
+        return SQLiteQueue(url[len("sqlite://"):])
+    if scheme in ("redis", "rediss", "unix"):
+        return RedisQueue(url)
+    raise ValueError(f"unsupported JOB_QUEUE_URL {url!r}")
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = open_queue()
+        return _queue
@@ -0,0 +1,82 @@
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+# the only characters that change the scanner's state
+_SPECIAL_RE = re.compile(r'[{}"\\]')
+
+
+def _loads(blob: str) -> Optional[Any]:
+    try:
+        return json.loads(blob)
+    except ValueError:
+        # models sometimes answer with single-quoted pseudo-JSON
+        try:
+            return json.loads(blob.replace("'", '"'))
+        except ValueError:
+            return None
+
+
+class JsonObjectScanner:
+    """
+    Finds complete top-level JSON objects in text that arrives in pieces
+    (e.g. streamed LLM output), without re-scanning what it has seen.
+    Braces inside strings are ignored; prose around the objects is skipped.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._start = 0
+        self._depth = 0
+        self._in_str = False
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Add ``chunk``; return the objects it completed, in order."""
+        self._text += chunk
+        text, pos = self._text, self._pos
+        found = []
+        for m in _SPECIAL_RE.finditer(text, pos):
+            i, c = m.start(), m.group()
+            if i < pos:
+                # the character after a backslash
+                continue
+            if self._in_str:
+                if c == "\\":
+                    pos = i + 2
+                    continue
+                if c == '"':
+                    self._in_str = False
+            elif c == '"':
+                self._in_str = self._depth > 0
+            elif c == "{":
+                if self._depth == 0:
+                    self._start = i
+                self._depth += 1
+            elif c == "}" and self._depth:
+                self._depth -= 1
+                if self._depth == 0:
+                    obj = _loads(text[self._start:i + 1])
+                    if isinstance(obj, dict):
+                        found.append(obj)
+            pos = i + 1
+        if self._depth == 0:
+            # nothing open: drop what has been consumed
+            self._text, self._pos = "", 0
+        else:
+            # may point one past the end when a chunk ends on a backslash
+            self._pos = max(pos, len(text))
+        return found
+
+
+def is_answer_object(obj: Dict[str, Any]) -> bool:
+    return "answer" in obj or "expression" in obj
+
+
+def first_json_object(text: str) -> Optional[Dict[str, Any]]:
+    """The first answer-shaped object in ``text``, else the first object, else None."""
+    objects = JsonObjectScanner().feed(text)
+    for obj in objects:
+        if is_answer_object(obj):
+            return obj
+    return objects[0] if objects else None
@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from app.log import get_logger
+
+from dotenv import load_dotenv
+load_dotenv()
+
+log = get_logger("llm_cache")
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") != "0"
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "3600"))
+# set to a file path to enable the on-disk tier
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "")
+
+
+def _normalise(text: str) -> str:
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+def make_key(model: str, system_prompt: str, user_prompt: str) -> str:
+    """
+    Cache key for an LLM call. Whitespace differences (indentation of the
+    triple-quoted prompts, trailing newlines) do not change the key.
+    """
+    blob = json.dumps([model, _normalise(system_prompt), _normalise(user_prompt)], ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class MemoryTier:
+    """In-process LRU with per-entry expiry."""
+
+    def __init__(self, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.max_entries = max(1, max_entries)
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float):
+        with self._lock:
+            self._data[key] = (time.time() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SQLiteTier:
+    """On-disk tier shared between processes and restarts."""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._db.execute("SELECT value, expires FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] < time.time():
+                self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: float):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + ttl),
+            )
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM llm_cache")
+            self._db.commit()
+
+
+class LLMCache:
+    """
+    Tiered response cache. Lookups go through ``tiers`` in order and a hit in
+    a slower tier is copied into the faster ones. Any object with
+    ``get(key)``, ``set(key, value, ttl)`` and ``clear()`` can be a tier.
+    """
+
+    def __init__(self, tiers: List[Any], ttl: float = LLM_CACHE_TTL):
+        self.tiers = tiers
+        self.ttl = ttl
+        self.stats = {"hits": 0, "misses": 0, "stores": 0}
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        for i, tier in enumerate(self.tiers):
+            try:
+                value = tier.get(key)
+            except Exception as e:
+                log.warning("llm cache read error: %s", e)
+                continue
+            if value is not None:
+                for faster in self.tiers[:i]:
+                    faster.set(key, value, self.ttl)
+                self.stats["hits"] += 1
+                return value
+        self.stats["misses"] += 1
+        return None
+
+    def set(self, key: str, value: Dict[str, Any]):
+        for tier in self.tiers:
+            try:
+                tier.set(key, value, self.ttl)
+            except Exception as e:
+                log.warning("llm cache write error: %s", e)
+        self.stats["stores"] += 1
+
+    def clear(self):
+        for tier in self.tiers:
+            tier.clear()
+
+
+_cache: Optional[LLMCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """The process-wide cache, or None when LLM_CACHE_ENABLED=0."""
+    global _cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            tiers = [MemoryTier()]
+            if LLM_CACHE_PATH:
+                tiers.append(SQLiteTier(LLM_CACHE_PATH))
+            _cache = LLMCache(tiers)
+        return _cache
+
+
+def set_llm_cache(cache: Optional[LLMCache]):
+    """Swap in a different cache (or pass None to fall back to the default)."""
+    global _cache
+    with _cache_lock:
+        _cache = cache
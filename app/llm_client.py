@@ -1,15 +1,31 @@
 import os
-import requests
 import json
-from typing import Dict, Any
+import time
+from typing import Callable, Dict, Any, Optional
 from dotenv import load_dotenv
 load_dotenv()
 
+from app.http_client import run_sync
+from app.llm_cache import get_llm_cache, make_key
+from app.prompt_builder import budget_for, count_tokens, truncate_tokens, visible_text
+from app.metrics import LLM_CALLS, LLM_TIME_TO_ANSWER, LLM_TOKENS
+from app.json_stream import is_answer_object
+from app.llm_transport import choose_model, post_responses, stream_responses
+from app.tracing import span
+
 AIPIPE_TOKEN = os.getenv("AIPIPE_TOKEN")
 AIPIPE_MODEL = os.getenv("AIPIPE_MODEL", "gpt-4.1")
+# cheaper/faster model the solver switches to when the run is short on time
+AIPIPE_FAST_MODEL = os.getenv("AIPIPE_FAST_MODEL", "gpt-4.1-nano")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+# stream replies and stop reading at the first {"answer"/"expression": ...} object
+LLM_STREAM = os.getenv("LLM_STREAM", "1") != "0"
 
 
-def call_llm(system_prompt: str, user_prompt: str, max_tokens: int = 1024) -> Dict[str, Any]:
+async def acall_llm(system_prompt: str, user_prompt: str, max_tokens: int = 1024, use_cache: bool = True,
+                    model: Optional[str] = None, timeout: Optional[float] = None,
+                    stream: Optional[bool] = None,
+                    validate: Optional[Callable[[str], bool]] = None) -> Dict[str, Any]:
     """
     Drop-in replacement for OpenAI ChatCompletion using AIPipe.
     Works exactly like the provided OpenAI wrapper.
@@ -19,7 +35,21 @@ def call_llm(system_prompt: str, user_prompt: str, max_tokens: int = 1024) -> Di
             "text": "<model_output_text>",
             "raw": <full_json_response>
         }
+
+    Identical (model, system, user) prompts are answered from the response
+    cache; pass use_cache=False to force a fresh call. With ``validate``
+    a reply is only cached when ``validate(text)`` is true, so a malformed
+    reply is never served again. ``model`` overrides
+    AIPIPE_MODEL and ``timeout`` (seconds) overrides LLM_TIMEOUT; retries
+    and hedges all fit inside it. While the model's recent p95 is over
+    LLM_SLO_SECONDS the call goes to AIPIPE_FAST_MODEL instead.
+
+    With ``stream`` (default LLM_STREAM) the reply is read as server-sent
+    events and cut off at the first complete answer/expression object
+    (``early``). ``time_to_answer`` is the seconds the call took to yield
+    its answer (0 for cache hits).
     """
+    model = choose_model(model or AIPIPE_MODEL, AIPIPE_FAST_MODEL)
 
     # If token missing → mock mode
     if not AIPIPE_TOKEN:
@@ -28,27 +58,36 @@ def call_llm(system_prompt: str, user_prompt: str, max_tokens: int = 1024) -> Di
             "raw": None
         }
 
+    cache = get_llm_cache() if use_cache else None
+    key = make_key(model, system_prompt, user_prompt)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            LLM_CALLS.inc(model=model, outcome="cached")
+            return {**cached, "time_to_answer": 0.0}
+
     # Prepare AIPipe-compatible input: system + user prompt combined
     combined_prompt = f"[SYSTEM]\n{system_prompt}\n\n[USER]\n{user_prompt}"
 
     # Make request
-    response = requests.post(
-        "https://aipipe.org/openai/v1/responses",
-        headers={
-            "Authorization": f"Bearer {AIPIPE_TOKEN}",
-            "Content-Type": "application/json"
-        },
-        json={
-            "model": AIPIPE_MODEL,
-            "input": combined_prompt,
-            # AIPipe ignores max_tokens but we keep it to match signature
-        }
-    )
-
-    # Raise exception for HTTP errors
-    response.raise_for_status()
-
-    data = response.json()
+    body = {"model": model, "input": combined_prompt}
+    stream = LLM_STREAM if stream is None else stream
+    with span("llm_call", model=model, stream=stream) as attrs:
+        start = time.perf_counter()
+        try:
+            if stream:
+                data = await stream_responses(body, AIPIPE_TOKEN, timeout or LLM_TIMEOUT, is_answer_object)
+            else:
+                data = await post_responses(body, AIPIPE_TOKEN, timeout or LLM_TIMEOUT)
+        except Exception:
+            LLM_CALLS.inc(model=model, outcome="error")
+            raise
+
+        time_to_answer = time.perf_counter() - start
+        early = bool(data.get("early"))
+        LLM_CALLS.inc(model=model, outcome="ok")
+        LLM_TIME_TO_ANSWER.observe(time_to_answer, model=model, early=str(early).lower())
+        attrs.update(_record_usage(model, data), time_to_answer=round(time_to_answer, 4), early=early)
 
     # Extract text from AIPipe structure
     try:
@@ -56,15 +95,29 @@ def call_llm(system_prompt: str, user_prompt: str, max_tokens: int = 1024) -> Di
     except Exception:
         text = str(data)
 
-    return {"text": text, "raw": data}
+    result = {"text": text, "raw": data, "time_to_answer": time_to_answer, "early": early}
+    if cache is not None and (validate is None or validate(text)):
+        cache.set(key, result)
+    return result
 
 
+def _record_usage(model: str, data: Dict[str, Any]) -> Dict[str, int]:
+    """Token counts from the responses-API ``usage`` block, added to the counters."""
+    usage = data.get("usage") or {}
+    tokens = {"input_tokens": int(usage.get("input_tokens") or 0), "output_tokens": int(usage.get("output_tokens") or 0)}
+    LLM_TOKENS.inc(tokens["input_tokens"], model=model, direction="input")
+    LLM_TOKENS.inc(tokens["output_tokens"], model=model, direction="output")
+    return tokens
 
 
+def call_llm(system_prompt: str, user_prompt: str, max_tokens: int = 1024, use_cache: bool = True,
+             model: Optional[str] = None, timeout: Optional[float] = None,
+             stream: Optional[bool] = None,
+             validate: Optional[Callable[[str], bool]] = None) -> Dict[str, Any]:
+    return run_sync(acall_llm(system_prompt, user_prompt, max_tokens, use_cache, model, timeout, stream, validate))
 
 
-
-def ask_steps_from_llm(html: str, aipipe_token: str = AIPIPE_TOKEN, model: str = "gpt-5-nano"):
+async def aask_steps_from_llm(html: str, aipipe_token: str = AIPIPE_TOKEN, model: str = "gpt-5-nano", use_cache: bool = True):
     """
     Calls AI Pipe's OpenAI proxy correctly using the /openai/v1/responses API.
 
@@ -73,8 +126,6 @@ def ask_steps_from_llm(html: str, aipipe_token: str = AIPIPE_TOKEN, model: str =
 
     So we combine system + user prompt manually into one long input string.
     """
-    print(aipipe_token)
-
     if not aipipe_token:
         raise RuntimeError("AIPIPE token missing")
 
@@ -113,10 +164,11 @@ def ask_steps_from_llm(html: str, aipipe_token: str = AIPIPE_TOKEN, model: str =
             - Keep steps minimal but complete.
             """
 
-    # USER PROMPT
+    # USER PROMPT: the visible page text, cut to what the model's budget leaves
+    page_text = truncate_tokens(visible_text(html), budget_for(model) - count_tokens(SYSTEM_PROMPT, model) - 100, model)
     USER_PROMPT = f"""
-            Here is the HTML content:
-            {html}
+            Here is the page content (visible text, links as [href]):
+            {page_text}
             
             Generate ONLY the JSON plan described above.
             Output must be valid JSON object with a "steps" array.
@@ -125,23 +177,15 @@ def ask_steps_from_llm(html: str, aipipe_token: str = AIPIPE_TOKEN, model: str =
     # Combine into a single text (AI Pipe requires this)
     full_prompt = SYSTEM_PROMPT + "\n\n" + USER_PROMPT
 
-    # ----------------------------
-    # Correct AIPipe API Call
-    # ----------------------------
-    response = requests.post(
-        "https://aipipe.org/openai/v1/responses",
-        headers={
-            "Authorization": f"Bearer {aipipe_token}",
-            "Content-Type": "application/json"
-        },
-        json={
-            "model": model,
-            "input": full_prompt
-        }
-    )
-
-    response.raise_for_status()
-    data = response.json()
+    cache = get_llm_cache() if use_cache else None
+    key = make_key(model, SYSTEM_PROMPT, USER_PROMPT)
+    cached = cache.get(key) if cache is not None else None
+    if cached is not None:
+        data = cached
+    else:
+        with span("llm_call", model=model) as attrs:
+            data = await post_responses({"model": model, "input": full_prompt}, aipipe_token, LLM_TIMEOUT)
+            attrs.update(_record_usage(model, data))
 
     # Extract text (AI Pipe format)
     # Structure:
@@ -150,7 +194,6 @@ def ask_steps_from_llm(html: str, aipipe_token: str = AIPIPE_TOKEN, model: str =
     #      { "role": "assistant", "content": [{ "text": "..."}] }
     #   ]
     # }
-
     text = data["output"][0]["content"][0]["text"].strip()
 
     # Parse the returned JSON
@@ -159,5 +202,11 @@ def ask_steps_from_llm(html: str, aipipe_token: str = AIPIPE_TOKEN, model: str =
     except json.JSONDecodeError:
         raise ValueError(f"AIPipe returned invalid JSON:\n{text}")
 
+    # only cache plans that parsed, so a bad answer gets a fresh retry
+    if cache is not None and cached is None:
+        cache.set(key, data)
     return parsed
 
+
+def ask_steps_from_llm(html: str, aipipe_token: str = AIPIPE_TOKEN, model: str = "gpt-5-nano", use_cache: bool = True):
+    return run_sync(aask_steps_from_llm(html, aipipe_token, model, use_cache))
@@ -0,0 +1,311 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from app.deadline import DeadlineExceeded
+from app.http_client import get_async_client
+from app.json_stream import JsonObjectScanner
+from app.log import get_logger
+from app.metrics import LLM_FALLBACKS, LLM_HEDGES, LLM_RETRIES
+
+log = get_logger("llm_transport")
+
+# overridable so benchmarks can point the client at a local stand-in
+AIPIPE_URL = os.getenv("AIPIPE_URL", "https://aipipe.org/openai/v1/responses")
+
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+# a second, identical request goes out once the first has taken longer than
+# the model's recent p95 (or LLM_HEDGE_AFTER until enough calls are seen)
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "1") != "0"
+LLM_HEDGE_AFTER = float(os.getenv("LLM_HEDGE_AFTER", "15"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+# when a model's recent p95 is above its SLO, calls go to the fallback model
+LLM_SLO_SECONDS = float(os.getenv("LLM_SLO_SECONDS", "30"))
+LLM_STATS_WINDOW = int(os.getenv("LLM_STATS_WINDOW", "200"))
+# older samples are ignored, so a model that was moved off recovers on its own
+LLM_STATS_MAX_AGE = float(os.getenv("LLM_STATS_MAX_AGE", "300"))
+# shared by every solve in the process; hedges only go out if a token is free
+LLM_RATE_PER_SECOND = float(os.getenv("LLM_RATE_PER_SECOND", "10"))
+LLM_RATE_BURST = int(os.getenv("LLM_RATE_BURST", "20"))
+
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+class LLMStreamError(RuntimeError):
+    """The endpoint reported an error event in the middle of a stream."""
+
+
+class RateLimiter:
+    """
+    Token bucket shared by every solve in the process. State sits behind a
+    threading lock so callers on different event loops (run_sync, workers)
+    draw from the same bucket.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self) -> float:
+        """Take a token if one is free; otherwise return how long until one is."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def try_acquire(self) -> bool:
+        return self.rate <= 0 or self._take() == 0.0
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            wait = self._take()
+            if wait == 0.0:
+                return
+            await asyncio.sleep(wait)
+
+
+class LatencyWindow:
+    """Recent call latencies per model (successes and timeouts)."""
+
+    def __init__(self, size: int, max_age: float):
+        self.size = size
+        self.max_age = max_age
+        self._samples: Dict[str, "deque[Tuple[float, float]]"] = {}
+        self._lock = threading.Lock()
+
+    def add(self, model: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(model, deque(maxlen=self.size)).append((time.monotonic(), seconds))
+
+    def _values(self, model: str) -> List[float]:
+        cutoff = time.monotonic() - self.max_age
+        with self._lock:
+            return sorted(s for t, s in self._samples.get(model, ()) if t >= cutoff)
+
+    def p95(self, model: str) -> Optional[float]:
+        values = self._values(model)
+        if len(values) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return values[min(len(values) - 1, int(len(values) * 0.95))]
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            models = list(self._samples)
+        snapshot = {m: self._values(m) for m in models}
+        return {m: {"count": len(v), "p50": v[len(v) // 2], "p95": v[min(len(v) - 1, int(len(v) * 0.95))]}
+                for m, v in snapshot.items() if v}
+
+
+_limiter = RateLimiter(LLM_RATE_PER_SECOND, LLM_RATE_BURST)
+_latency = LatencyWindow(LLM_STATS_WINDOW, LLM_STATS_MAX_AGE)
+
+
+def transport_stats() -> Dict[str, Any]:
+    return {"latency": _latency.stats(), "slo_seconds": LLM_SLO_SECONDS}
+
+
+def choose_model(model: str, fallback: Optional[str]) -> str:
+    """``fallback`` while ``model``'s recent p95 breaches LLM_SLO_SECONDS, else ``model``."""
+    if not fallback or fallback == model:
+        return model
+    p95 = _latency.p95(model)
+    if p95 is not None and p95 > LLM_SLO_SECONDS:
+        LLM_FALLBACKS.inc(model=model, to=fallback)
+        log.debug("%s p95 %.1fs over SLO, using %s", model, p95, fallback)
+        return fallback
+    return model
+
+
+def _hedge_delay(model: str) -> float:
+    p95 = _latency.p95(model)
+    return LLM_HEDGE_AFTER if p95 is None else p95
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    if isinstance(error, httpx.HTTPStatusError):
+        try:
+            return float(error.response.headers.get("retry-after", ""))
+        except ValueError:
+            return None
+    return None
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUS
+    return isinstance(error, (httpx.TransportError, json.JSONDecodeError))
+
+
+async def _send(body: Dict[str, Any], token: str, timeout: float) -> Dict[str, Any]:
+    response = await get_async_client().post(
+        AIPIPE_URL,
+        timeout=timeout,
+        headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
+        json=body,
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+async def _hedged(body: Dict[str, Any], token: str, timeout: float) -> Dict[str, Any]:
+    """
+    One attempt. If it is still pending after the hedge delay (and the rate
+    limiter has a spare token) an identical request races it; the first
+    success wins and the other is cancelled.
+    """
+    model = body["model"]
+    start = time.monotonic()
+    first = asyncio.ensure_future(_send(body, token, timeout))
+    tasks = {first}
+    delay = _hedge_delay(model)
+    try:
+        if LLM_HEDGE_ENABLED and delay < timeout:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and _limiter.try_acquire():
+                tasks.add(asyncio.ensure_future(_send(body, token, timeout - delay)))
+                LLM_HEDGES.inc(model=model, outcome="sent")
+        error: Optional[BaseException] = None
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not first:
+                        LLM_HEDGES.inc(model=model, outcome="won")
+                    _latency.add(model, time.monotonic() - start)
+                    return task.result()
+                error = task.exception()
+        if isinstance(error, httpx.TimeoutException):
+            # count timeouts too, or a model that always times out never trips the SLO
+            _latency.add(model, time.monotonic() - start)
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _with_retries(model: str, timeout: float,
+                        attempt_fn: Callable[[float], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Run ``attempt_fn(remaining_seconds)`` under the shared rate limiter,
+    retrying 429/5xx and transport errors with full-jitter exponential
+    backoff (honouring Retry-After) until ``timeout`` is spent. httpx
+    timeouts apply per read/write, so each attempt is also bounded as a
+    whole; running out of time raises DeadlineExceeded.
+    """
+    deadline = time.monotonic() + timeout
+    attempt = 0
+    while True:
+        await _limiter.acquire()
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"LLM call to {model} ran out of time")
+        try:
+            async with asyncio.timeout(remaining):
+                return await attempt_fn(remaining)
+        except Exception as e:
+            if isinstance(e, (TimeoutError, httpx.TimeoutException)) and time.monotonic() >= deadline:
+                raise DeadlineExceeded(f"LLM call to {model} timed out after {timeout:.1f}s") from e
+            if attempt >= LLM_MAX_RETRIES or not _is_retryable(e):
+                raise
+            pause = _retry_after(e)
+            if pause is None:
+                pause = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+            if time.monotonic() + pause >= deadline:
+                raise
+            reason = str(e.response.status_code) if isinstance(e, httpx.HTTPStatusError) else type(e).__name__
+            LLM_RETRIES.inc(model=model, reason=reason)
+            log.info("retrying %s after %s in %.2fs", model, reason, pause)
+            attempt += 1
+            await asyncio.sleep(pause)
+
+
+async def post_responses(body: Dict[str, Any], token: str, timeout: float) -> Dict[str, Any]:
+    """
+    POST ``body`` ({"model", "input"}) to the responses endpoint and return
+    the decoded reply. ``timeout`` bounds the whole call, retries included.
+
+    Rate limited process-wide, retried on 429/5xx, and slow attempts are
+    hedged. Callers pick the model with choose_model() first.
+    """
+    return await _with_retries(body["model"], timeout, lambda remaining: _hedged(body, token, remaining))
+
+
+async def _stream_once(body: Dict[str, Any], token: str, timeout: float,
+                       accept: Callable[[Dict[str, Any]], bool]) -> Dict[str, Any]:
+    start = time.monotonic()
+    scanner = JsonObjectScanner()
+    parts: List[str] = []
+    usage: Dict[str, Any] = {}
+    early = False
+    async with get_async_client().stream(
+        "POST",
+        AIPIPE_URL,
+        timeout=timeout,
+        headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
+        json={**body, "stream": True},
+    ) as response:
+        response.raise_for_status()
+        if not response.headers.get("content-type", "").startswith("text/event-stream"):
+            # the proxy ignored "stream" and answered in one piece
+            data = json.loads(await response.aread())
+            _latency.add(body["model"], time.monotonic() - start)
+            return data
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            payload = line[5:].strip()
+            if payload == "[DONE]":
+                break
+            event = json.loads(payload)
+            kind = event.get("type", "")
+            if kind == "response.output_text.delta":
+                delta = event.get("delta") or ""
+                parts.append(delta)
+                if any(accept(obj) for obj in scanner.feed(delta)):
+                    # leaving the block closes the stream; the rest is never generated for us
+                    early = True
+                    break
+            elif kind == "response.completed":
+                usage = (event.get("response") or {}).get("usage") or {}
+            elif kind in ("error", "response.failed"):
+                raise LLMStreamError(f"LLM stream failed: {payload[:300]}")
+    _latency.add(body["model"], time.monotonic() - start)
+    return {
+        "output": [{"role": "assistant", "content": [{"type": "output_text", "text": "".join(parts)}]}],
+        "usage": usage,
+        "early": early,
+    }
+
+
+async def stream_responses(body: Dict[str, Any], token: str, timeout: float,
+                           accept: Callable[[Dict[str, Any]], bool]) -> Dict[str, Any]:
+    """
+    Like post_responses but asks for server-sent events and parses the
+    output as it arrives. As soon as a complete top-level JSON object
+    satisfies ``accept`` the stream is closed and the text so far is
+    returned (``"early": True``; usage is then unknown). Retries apply;
+    hedging does not, since the stream is already cut short.
+    """
+    return await _with_retries(body["model"], timeout,
+                               lambda remaining: _stream_once(body, token, remaining, accept))
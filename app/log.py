@@ -0,0 +1,37 @@
+import logging
+import os
+import random
+
+from dotenv import load_dotenv
+load_dotenv()
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# records at or below LOG_SAMPLE_LEVEL are kept with probability LOG_SAMPLE_RATE;
+# warnings and errors are never dropped
+LOG_SAMPLE_LEVEL = os.getenv("LOG_SAMPLE_LEVEL", "DEBUG").upper()
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+
+
+class SampleFilter(logging.Filter):
+    def __init__(self, level: int, rate: float):
+        super().__init__()
+        self.level = level
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > self.level or self.rate >= 1.0 or random.random() < self.rate
+
+
+_handler = logging.StreamHandler()
+_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+_handler.addFilter(SampleFilter(logging.getLevelName(LOG_SAMPLE_LEVEL), LOG_SAMPLE_RATE))
+
+_root = logging.getLogger("quiz")
+_root.setLevel(LOG_LEVEL)
+_root.addHandler(_handler)
+_root.propagate = False
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger under the "quiz" hierarchy, e.g. get_logger("solver") -> quiz.solver."""
+    return _root.getChild(name)
@@ -1,19 +1,171 @@
 import asyncio
 import os
 import time
+# start of the import phase; cold-start timings below are measured from here
+_STARTED = time.perf_counter()
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlparse
 from fastapi import FastAPI, Request, HTTPException
 from pydantic import BaseModel
-from starlette.responses import JSONResponse
-from app.solver import solve_quiz_entrypoint
+from starlette.responses import JSONResponse, PlainTextResponse
+from app.solver import asolve_quiz_entrypoint
+from app.browser_pool import get_pool, shutdown_pool
+from app.browser_utils import FETCH_TIER_COUNTS
+from app.render_profiles import phase_stats
+from app.http_client import close_async_client
+from app.llm_cache import get_llm_cache
+from app.llm_transport import transport_stats
+from app.dataset_registry import get_frame_cache
+from app.pdf_engine import shutdown_pdf_pool
+from app.ocr import shutdown_ocr_pool
+from app.job_queue import get_job_queue, public_view
+from app.worker import Worker
+from app import metrics
+from app.log import get_logger
+from app.tracing import start_trace
+from app.warmup import WARMUP_STEPS, run_warmup
 from dotenv import load_dotenv
 load_dotenv()
 
-app = FastAPI()
+log = get_logger("api")
+
+# cold-start report, served by /ready
+STARTUP: Dict[str, Any] = {"import_seconds": round(time.perf_counter() - _STARTED, 3), "ready": False,
+                           "warmup": None, "ready_after_seconds": None,
+                           "first_solve_seconds": None, "first_solve_after_seconds": None}
+metrics.STARTUP_SECONDS.set(STARTUP["import_seconds"], phase="import")
+
+
+# "inline": /solve runs the solver and answers when it is done
+# "queue": /solve enqueues a job and answers at once; poll /jobs/{id}
+JOB_MODE = os.getenv("JOB_MODE", "inline")
+# worker slots inside this process in queue mode (0 = external workers only)
+JOB_LOCAL_WORKERS = int(os.getenv("JOB_LOCAL_WORKERS", "1"))
+
+
+async def _warm_up():
+    # browser launch, connection priming and a dummy parse, so the first
+    # /solve does not pay for them; /ready flips once this is done
+    report = await run_warmup(WARMUP_STEPS)
+    STARTUP.update(warmup=report, ready=True, ready_after_seconds=round(time.perf_counter() - _STARTED, 3))
+    metrics.STARTUP_SECONDS.set(report["seconds"], phase="warmup")
+    metrics.STARTUP_SECONDS.set(STARTUP["ready_after_seconds"], phase="ready")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warmup_task = asyncio.create_task(_warm_up())
+    stop = asyncio.Event()
+    worker_task = None
+    if JOB_MODE == "queue" and JOB_LOCAL_WORKERS > 0:
+        app.state.worker = Worker(concurrency=JOB_LOCAL_WORKERS)
+        worker_task = asyncio.create_task(app.state.worker.run(stop))
+    yield
+    warmup_task.cancel()
+    stop.set()
+    if worker_task is not None:
+        try:
+            await asyncio.wait_for(worker_task, timeout=5)
+        except (asyncio.TimeoutError, Exception) as e:
+            log.warning("local worker did not stop cleanly: %s", e)
+    await close_async_client()
+    await asyncio.to_thread(shutdown_pool)
+    shutdown_pdf_pool()
+    shutdown_ocr_pool()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 # Environment Variables
-MAX_RUN_SECONDS = int(os.getenv("MAX_RUN_SECOND"))
+MAX_RUN_SECONDS = int(os.getenv("MAX_RUN_SECOND", "170"))
 secret = os.getenv("SECRET_KEY")
+# repeats of a finished (email, url) within this many seconds get its result
+SOLVE_RESULT_TTL = float(os.getenv("SOLVE_RESULT_TTL", "30"))
+# solves one email may run at once; further requests wait their turn
+SOLVE_PER_EMAIL_LIMIT = int(os.getenv("SOLVE_PER_EMAIL_LIMIT", "2"))
+
+
+# single-flight state: one solve per (email, url), shared by every request for it.
+# All of it is per process: with WEB_WORKERS > 1 each worker coalesces, caches
+# and applies SOLVE_PER_EMAIL_LIMIT on its own
+_inflight: Dict[Tuple[str, str], asyncio.Task] = {}
+_inflight_jobs: Dict[Tuple[str, str], str] = {}
+_recent: Dict[Tuple[str, str], Tuple[float, Dict[str, Any]]] = {}
+_email_slots: Dict[str, asyncio.Semaphore] = {}
+# requests holding or waiting for each email's semaphore; it is dropped at zero
+_email_users: Dict[str, int] = {}
+SOLVE_STATS = {"solves": 0, "coalesced": 0, "cache_hits": 0, "email_waits": 0}
+
+
+def _recent_result(key: Tuple[str, str]) -> Optional[Dict[str, Any]]:
+    hit = _recent.get(key)
+    if hit is None:
+        return None
+    if hit[0] < time.monotonic():
+        del _recent[key]
+        return None
+    return hit[1]
+
+
+def _remember(key: Tuple[str, str], content: Dict[str, Any]):
+    now = time.monotonic()
+    for k in [k for k, (expires, _) in _recent.items() if expires < now]:
+        del _recent[k]
+    if SOLVE_RESULT_TTL > 0:
+        _recent[key] = (now + SOLVE_RESULT_TTL, content)
+
+
+@asynccontextmanager
+async def _email_slot(email: str):
+    """
+    One of the email's SOLVE_PER_EMAIL_LIMIT slots. The semaphore lives as
+    long as anyone holds or waits for it, so the limit is never reset by a
+    fresh semaphore while a solve for that email is running.
+    """
+    slot = _email_slots.get(email)
+    if slot is None:
+        slot = _email_slots[email] = asyncio.Semaphore(max(1, SOLVE_PER_EMAIL_LIMIT))
+    _email_users[email] = _email_users.get(email, 0) + 1
+    try:
+        if slot.locked():
+            SOLVE_STATS["email_waits"] += 1
+        async with slot:
+            yield
+    finally:
+        _email_users[email] -= 1
+        if not _email_users[email]:
+            del _email_users[email], _email_slots[email]
+
+
+async def _solve_once(key: Tuple[str, str], q: "QuizRequest", arrived: float) -> Dict[str, Any]:
+    async with _email_slot(q.email):
+        # the quiz window started when the request arrived, not when a slot freed up
+        budget = MAX_RUN_SECONDS - (time.time() - arrived)
+        if budget <= 0:
+            raise asyncio.TimeoutError("solve budget spent waiting for a slot")
+        SOLVE_STATS["solves"] += 1
+        start = time.time()
+        # runs in its own task, so the trace covers exactly this solve
+        trace = start_trace()
+        status = "error"
+        try:
+            result = await asyncio.wait_for(
+                asolve_quiz_entrypoint(q.email, q.secret, q.url, budget),
+                timeout=budget + 5
+            )
+            status = result.get("status", "done")
+        finally:
+            metrics.SOLVE_SECONDS.observe(time.time() - start, status=status)
+            if STARTUP["first_solve_seconds"] is None:
+                STARTUP["first_solve_seconds"] = round(time.time() - start, 3)
+                STARTUP["first_solve_after_seconds"] = round(time.perf_counter() - _STARTED, 3)
+                metrics.STARTUP_SECONDS.set(STARTUP["first_solve_after_seconds"], phase="first_solve")
+        content = {"ok": True, "elapsed_second": time.time() - start, "waited_second": round(start - arrived, 3),
+                   "result": result, "trace": trace.summary()}
+    _remember(key, content)
+    return content
 
 
 
@@ -22,6 +174,8 @@ class QuizRequest(BaseModel):
     email:str
     secret:str
     url:str
+    # attach the per-stage trace of the solve to the response
+    trace:bool = False
 
 @app.get("/")
 def home():
@@ -31,6 +185,55 @@ def home():
         "usage": "Send a POST request to /solve with your quiz task."
     }
 
+@app.get("/ready")
+def ready():
+    # readiness, separate from liveness ("/"): 503 until the warmup has run
+    return JSONResponse(STARTUP, status_code=200 if STARTUP["ready"] else 503)
+
+@app.get("/pool")
+def pool_stats():
+    return {**get_pool().stats(), "fetch_tiers": FETCH_TIER_COUNTS, "render_phases": phase_stats()}
+
+@app.get("/llm_cache")
+def llm_cache_stats():
+    cache = get_llm_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, "ttl": cache.ttl, **cache.stats}
+
+@app.get("/llm")
+def llm_transport_stats():
+    return transport_stats()
+
+@app.get("/datasets")
+def dataset_cache_stats():
+    return get_frame_cache().info()
+
+def _response(content: Dict[str, Any], trace: bool, **flags) -> Dict[str, Any]:
+    out = {k: v for k, v in content.items() if trace or k != "trace"}
+    out.update({k: True for k, v in flags.items() if v})
+    return out
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/solve_stats")
+def solve_stats():
+    return {**SOLVE_STATS, "in_flight": len(_inflight), "recent_results": len(_recent)}
+
+@app.get("/jobs")
+def job_stats():
+    worker = getattr(app.state, "worker", None)
+    return {"mode": JOB_MODE, "queue": get_job_queue().stats(), "local_worker": worker.stats if worker else None}
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = await asyncio.to_thread(get_job_queue().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="unknown job")
+    return public_view(job)
+
 @app.post("/solve")
 async def solve(req:Request):
     try:
@@ -45,18 +248,41 @@ async def solve(req:Request):
 
     if q.secret != secret:
         raise HTTPException(status_code=403, detail="Invalid secret")
+    arrived = time.time()
+
+    key = (q.email, q.url)
+    if JOB_MODE == "queue":
+        # identical requests while the job is still pending share its id
+        job_id = _inflight_jobs.get(key)
+        job = await asyncio.to_thread(get_job_queue().get, job_id) if job_id else None
+        if job is not None and job["status"] in ("queued", "running"):
+            SOLVE_STATS["coalesced"] += 1
+        else:
+            payload = {"email": q.email, "secret": q.secret, "url": q.url, "budget": MAX_RUN_SECONDS}
+            job_id = await asyncio.to_thread(get_job_queue().put, payload, urlparse(q.url).hostname)
+            _inflight_jobs[key] = job_id
+            while len(_inflight_jobs) > 1024:
+                del _inflight_jobs[next(iter(_inflight_jobs))]
+        return JSONResponse(status_code=200, content={"ok": True, "job_id": job_id, "status_url": f"/jobs/{job_id}"})
+
+    cached = _recent_result(key)
+    if cached is not None:
+        SOLVE_STATS["cache_hits"] += 1
+        return JSONResponse(status_code=200, content=_response(cached, q.trace, cached=True))
 
-    # Run solver with timeout
-    start = time.time()
+    task = _inflight.get(key)
+    shared = task is not None
+    if shared:
+        SOLVE_STATS["coalesced"] += 1
+    else:
+        task = _inflight[key] = asyncio.create_task(_solve_once(key, q, arrived))
+        task.add_done_callback(lambda t: _inflight.pop(key, None) if _inflight.get(key) is t else None)
 
     try:
-        result = await asyncio.wait_for(
-            asyncio.to_thread(solve_quiz_entrypoint, q.email, q.secret,q.url,MAX_RUN_SECONDS),
-            timeout=MAX_RUN_SECONDS + 5
-        )
+        # shielded: one caller disconnecting must not cancel the solve the others wait on
+        content = await asyncio.shield(task)
     except asyncio.TimeoutError:
         raise HTTPException(status_code=500,detail="solver time out")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"solver error {e}")
-    elapsed = time.time()-start
-    return JSONResponse(status_code=200, content={"ok":True,"elapsed_second":elapsed,"result":result})
\ No newline at end of file
+    return JSONResponse(status_code=200, content=_response(content, q.trace, shared=shared))
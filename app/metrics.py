@@ -0,0 +1,111 @@
+import bisect
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+# seconds; covers sub-millisecond parses up to multi-minute solves
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+LabelValues = Tuple[str, ...]
+
+
+def _labels(names: Sequence[str], values: LabelValues) -> str:
+    if not names:
+        return ""
+    pairs = ",".join('%s="%s"' % (n, str(v).replace("\\", "\\\\").replace('"', '\\"')) for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [bucket counts..., +Inf count], sum
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            total[0] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                running = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    running += count
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames + ('le',), key + (le,))} {running}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total[0]:.6f}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {running}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def set(self, value: float, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {value:g}")
+        return lines
+
+
+REGISTRY: List = []
+
+
+def render() -> str:
+    """Every registered metric in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+STAGE_SECONDS = Histogram("quiz_stage_seconds", "Time spent per pipeline stage", ("stage",))
+SOLVE_SECONDS = Histogram("quiz_solve_seconds", "Wall time of a whole /solve run", ("status",))
+LLM_CALLS = Counter("quiz_llm_calls_total", "LLM calls by model and outcome", ("model", "outcome"))
+LLM_TOKENS = Counter("quiz_llm_tokens_total", "LLM tokens by model and direction", ("model", "direction"))
+LLM_TIME_TO_ANSWER = Histogram("quiz_llm_time_to_answer_seconds",
+                               "Time until an LLM call had its answer (early: stream cut at the answer object)",
+                               ("model", "early"))
+LLM_RETRIES = Counter("quiz_llm_retries_total", "LLM attempts retried, by model and reason", ("model", "reason"))
+LLM_HEDGES = Counter("quiz_llm_hedges_total", "Hedged LLM requests sent and won", ("model", "outcome"))
+LLM_FALLBACKS = Counter("quiz_llm_fallbacks_total", "LLM calls moved to the fallback model", ("model", "to"))
+FETCHES = Counter("quiz_page_fetches_total", "Quiz page fetches by tier", ("tier",))
+STARTUP_SECONDS = Gauge("quiz_startup_seconds", "Cold-start phases: import, warmup, ready, first_solve", ("phase",))
+DOWNLOADS = Counter("quiz_downloads_total", "Attachment downloads by outcome", ("outcome",))
@@ -0,0 +1,169 @@
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeout, as_completed
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from app.pdf_engine import extract_pdf, file_hash
+from app.log import get_logger
+
+from dotenv import load_dotenv
+load_dotenv()
+
+log = get_logger("ocr")
+
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(min(2, os.cpu_count() or 1))))
+OCR_DPI = int(os.getenv("OCR_DPI", "200"))
+# images larger than this on their long side are downscaled before OCR
+OCR_MAX_SIDE = int(os.getenv("OCR_MAX_SIDE", "2500"))
+OCR_MAX_SECONDS = float(os.getenv("OCR_MAX_SECONDS", "30"))
+OCR_CACHE_MAX_ENTRIES = int(os.getenv("OCR_CACHE_MAX_ENTRIES", "1000"))
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".bmp", ".tif", ".tiff", ".webp")
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+
+def preprocess(img: "Image.Image") -> "Image.Image":
+    """Grayscale, stretch contrast, binarise and cap the resolution."""
+    # PIL/pytesseract load on the first OCR job, not at app start
+    from PIL import Image, ImageOps
+    img = ImageOps.exif_transpose(img).convert("L")
+    longest = max(img.size)
+    if longest > OCR_MAX_SIDE:
+        scale = OCR_MAX_SIDE / longest
+        img = img.resize((max(1, int(img.width * scale)), max(1, int(img.height * scale))), Image.LANCZOS)
+    img = ImageOps.autocontrast(img)
+    return img.point(lambda v: 255 if v > 160 else 0, mode="1")
+
+
+def _ocr_job(kind: str, path: str, page: Optional[int], deadline: float) -> Tuple[str, float]:
+    """
+    Worker: load (or render) one image, preprocess it and run tesseract.
+    Tesseract is killed at ``deadline`` (a time.time() value); a running job
+    cannot be cancelled from outside, so this is what frees the worker.
+    """
+    if time.time() >= deadline:
+        raise TimeoutError("OCR budget spent before the job started")
+    from PIL import Image
+    import pytesseract
+    started = time.perf_counter()
+    if kind == "pdf":
+        import pypdfium2 as pdfium
+        pdf = pdfium.PdfDocument(path)
+        try:
+            img = pdf[page - 1].render(scale=OCR_DPI / 72).to_pil()
+        finally:
+            pdf.close()
+    else:
+        img = Image.open(path)
+        img.seek(0)
+    img = preprocess(img)
+    # timeout=0 would mean no limit
+    text = pytesseract.image_to_string(img, config=f"--dpi {OCR_DPI}", timeout=max(0.1, deadline - time.time()))
+    return text, time.perf_counter() - started
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+_cache: "OrderedDict[Tuple[str, Optional[int]], str]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn, not fork: this process runs threads (browser pool, uvicorn,
+            # to_thread workers) whose locks a forked child would inherit held
+            _executor = ProcessPoolExecutor(max_workers=OCR_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def shutdown_ocr_pool():
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def is_image(path: str) -> bool:
+    return Path(path).suffix.lower() in IMAGE_EXTENSIONS
+
+
+def find_ocr_jobs(files: List[str], pdf_pages: Optional[List[int]] = None) -> List[Tuple[str, str, Optional[int]]]:
+    """Image attachments plus PDF pages that carry no text layer."""
+    jobs = []
+    for f in files:
+        if is_image(f):
+            jobs.append(("image", f, None))
+        elif f.lower().endswith(".pdf"):
+            try:
+                extraction = extract_pdf(f, pdf_pages)
+            except Exception as e:
+                log.warning("pdf scan error %s: %s", f, e)
+                continue
+            for page_no, text, _ in extraction.pages:
+                if not text.strip():
+                    jobs.append(("pdf", f, page_no))
+    return jobs
+
+
+def run_ocr(files: List[str], pdf_pages: Optional[List[int]] = None, budget_seconds: float = OCR_MAX_SECONDS) -> Dict[str, Any]:
+    """
+    OCR every image attachment and image-only PDF page. Results are cached by
+    file hash (+ page). Work still pending when ``budget_seconds`` runs out is
+    dropped, and jobs already running are killed then. Returns the combined text and a per-page timing report.
+    """
+    deadline = time.monotonic() + max(0.0, budget_seconds)
+    # the same instant on the wall clock, which the worker processes share
+    job_deadline = time.time() + max(0.0, budget_seconds)
+    report = []
+    texts: Dict[int, str] = {}
+    pending = {}
+
+    jobs = find_ocr_jobs(files, pdf_pages)
+    for i, (kind, path, page) in enumerate(jobs):
+        key = (file_hash(path), page)
+        with _cache_lock:
+            cached = _cache.get(key)
+            if cached is not None:
+                _cache.move_to_end(key)
+        if cached is not None:
+            texts[i] = cached
+            report.append({"file": path, "page": page, "cached": True, "seconds": 0.0})
+            continue
+        pending[_get_executor().submit(_ocr_job, kind, path, page, job_deadline)] = (i, key, path, page)
+
+    if pending:
+        timeout = max(0.0, deadline - time.monotonic())
+        try:
+            for fut in as_completed(pending, timeout=timeout):
+                i, key, path, page = pending[fut]
+                try:
+                    text, seconds = fut.result()
+                except Exception as e:
+                    log.warning("ocr error %s page %s: %s", path, page, e)
+                    continue
+                texts[i] = text
+                with _cache_lock:
+                    _cache[key] = text
+                    while len(_cache) > OCR_CACHE_MAX_ENTRIES:
+                        _cache.popitem(last=False)
+                report.append({"file": path, "page": page, "cached": False, "seconds": round(seconds, 3)})
+        except FuturesTimeout:
+            for fut, (i, key, path, page) in pending.items():
+                if not fut.done():
+                    fut.cancel()
+                    report.append({"file": path, "page": page, "skipped": "budget"})
+
+    return {"text": "\n".join(texts[i] for i in sorted(texts)), "pages": report}
+
+
+def ocr_file(path: str) -> str:
+    return run_ocr([path])["text"]
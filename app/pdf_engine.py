@@ -0,0 +1,155 @@
+import hashlib
+import multiprocessing
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from dotenv import load_dotenv
+load_dotenv()
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+# PDFs with fewer pages than this are parsed in-process; the pool isn't worth it
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "8"))
+PDF_CACHE_MAX_PAGES = int(os.getenv("PDF_CACHE_MAX_PAGES", "5000"))
+
+# (page_no, text, raw tables as lists of rows)
+PageResult = Tuple[int, str, List[List[List[Optional[str]]]]]
+
+
+class PdfExtraction:
+    """Text and tables from one pass over (a range of) a PDF's pages."""
+
+    def __init__(self, pages: List[PageResult]):
+        self.pages = pages
+
+    @property
+    def text(self) -> str:
+        return "".join(text for _, text, _ in self.pages)
+
+    @property
+    def tables(self) -> List[pd.DataFrame]:
+        dfs = []
+        for _, _, tables in self.pages:
+            for table in tables:
+                # convert table (list of lists) to DataFrame
+                if not table:
+                    continue
+                dfs.append(pd.DataFrame(table[1:], columns=table[0]))
+        return dfs
+
+
+def _extract_pages(path: str, page_numbers: List[int]) -> List[PageResult]:
+    """Worker: open the PDF once and extract text + tables for the given 1-based pages."""
+    # imported on first use so app start does not pay for pdfplumber/pdfminer
+    import pdfplumber
+    out = []
+    with pdfplumber.open(path) as pdf:
+        for n in page_numbers:
+            page = pdf.pages[n - 1]
+            out.append((n, page.extract_text() or "", page.extract_tables()))
+    return out
+
+
+def _page_count(path: str) -> int:
+    import pdfplumber
+    with pdfplumber.open(path) as pdf:
+        return len(pdf.pages)
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+# per-page memo keyed by (file hash, page number), so any page range of a
+# known PDF is served without reopening it
+_pages: "OrderedDict[Tuple[str, int], PageResult]" = OrderedDict()
+_page_counts: Dict[str, int] = {}
+_cache_lock = threading.Lock()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn, not fork: this process runs threads (browser pool, uvicorn,
+            # to_thread workers) whose locks a forked child would inherit held
+            _executor = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def shutdown_pdf_pool():
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _remember(key: str, results: List[PageResult]):
+    with _cache_lock:
+        for res in results:
+            _pages[(key, res[0])] = res
+            _pages.move_to_end((key, res[0]))
+        while len(_pages) > PDF_CACHE_MAX_PAGES:
+            _pages.popitem(last=False)
+
+
+def extract_pdf(path: str, pages: Optional[List[int]] = None) -> PdfExtraction:
+    """
+    Extract text and tables in one pass. ``pages`` is a list of 1-based page
+    numbers (None = all). Large PDFs are split across a process pool and every
+    page result is memoised by file hash.
+    """
+    key = file_hash(path)
+    with _cache_lock:
+        count = _page_counts.get(key)
+    if count is None:
+        count = _page_count(path)
+        with _cache_lock:
+            _page_counts[key] = count
+
+    wanted = [p for p in (pages or range(1, count + 1)) if 1 <= p <= count]
+    with _cache_lock:
+        cached = {p: _pages[(key, p)] for p in wanted if (key, p) in _pages}
+        for p in cached:
+            _pages.move_to_end((key, p))
+    missing = [p for p in wanted if p not in cached]
+
+    if missing:
+        if len(missing) < PDF_PARALLEL_MIN_PAGES or PDF_WORKERS <= 1:
+            results = _extract_pages(path, missing)
+        else:
+            n = min(PDF_WORKERS, len(missing))
+            chunks = [missing[i::n] for i in range(n)]
+            futures = [_get_executor().submit(_extract_pages, path, chunk) for chunk in chunks]
+            results = [res for fut in futures for res in fut.result()]
+        _remember(key, results)
+        for res in results:
+            cached[res[0]] = res
+
+    return PdfExtraction([cached[p] for p in wanted])
+
+
+_PAGE_RANGE = re.compile(r"\bpages?\s+(\d+)(?:\s*(?:-|–|to|through)\s*(\d+))?", re.IGNORECASE)
+
+
+def parse_page_range(text: str) -> Optional[List[int]]:
+    """Pages named in a question ("page 2", "pages 3-5"), or None for all."""
+    pages = []
+    for m in _PAGE_RANGE.finditer(text or ""):
+        start = int(m.group(1))
+        end = int(m.group(2)) if m.group(2) else start
+        pages.extend(range(start, max(start, end) + 1))
+    return sorted(set(pages)) or None
@@ -0,0 +1,208 @@
+import html as htmllib
+import json
+import os
+import re
+from importlib.util import find_spec
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from app.log import get_logger
+
+# checked without importing; tiktoken loads with the first encoding
+HAVE_TIKTOKEN = find_spec("tiktoken") is not None
+
+from dotenv import load_dotenv
+load_dotenv()
+
+log = get_logger("prompt")
+
+# default input-token budget, and per-model overrides as a JSON object,
+# e.g. {"gpt-4.1-nano": 3000, "gpt-4.1": 12000}
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "6000"))
+PROMPT_TOKEN_BUDGETS = os.getenv("PROMPT_TOKEN_BUDGETS", "")
+# rows read to compute the per-column stats, and example values per column
+PROMPT_SAMPLE_ROWS = int(os.getenv("PROMPT_SAMPLE_ROWS", "200"))
+PROMPT_SAMPLE_VALUES = int(os.getenv("PROMPT_SAMPLE_VALUES", "5"))
+
+_DEFAULT_BUDGETS = {"gpt-4.1-nano": 4000, "gpt-5-nano": 8000, "gpt-4.1": 8000}
+
+
+def _load_budgets() -> Dict[str, int]:
+    budgets = dict(_DEFAULT_BUDGETS)
+    if PROMPT_TOKEN_BUDGETS:
+        try:
+            budgets.update({k: int(v) for k, v in json.loads(PROMPT_TOKEN_BUDGETS).items()})
+        except (ValueError, AttributeError) as e:
+            log.error("invalid PROMPT_TOKEN_BUDGETS: %s", e)
+    return budgets
+
+
+_budgets = _load_budgets()
+
+
+def budget_for(model: Optional[str]) -> int:
+    return _budgets.get(model or "", PROMPT_TOKEN_BUDGET)
+
+
+# ----------------------------------------------------------------------
+# token counting
+# ----------------------------------------------------------------------
+_encodings: Dict[str, Any] = {}
+
+
+def _encoding(model: Optional[str]):
+    key = model or ""
+    if key not in _encodings:
+        import tiktoken
+        try:
+            _encodings[key] = tiktoken.encoding_for_model(model or "gpt-4o")
+        except KeyError:
+            _encodings[key] = tiktoken.get_encoding("o200k_base")
+    return _encodings[key]
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Exact with tiktoken installed, otherwise the usual ~4 chars/token estimate."""
+    if not text:
+        return 0
+    if HAVE_TIKTOKEN:
+        return len(_encoding(model).encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def truncate_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    if max_tokens <= 0:
+        return ""
+    if HAVE_TIKTOKEN:
+        tokens = _encoding(model).encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        return _encoding(model).decode(tokens[:max_tokens]) + " ..."
+    if len(text) <= max_tokens * 4:
+        return text
+    return text[:max_tokens * 4] + " ..."
+
+
+# ----------------------------------------------------------------------
+# compaction
+# ----------------------------------------------------------------------
+_INVISIBLE_RE = re.compile(
+    r"<!--.*?-->|<(script|style|noscript|template|svg|head)\b[^>]*>.*?</\1\s*>", re.IGNORECASE | re.DOTALL
+)
+_LINK_RE = re.compile(r"""<a\b[^>]*?\bhref\s*=\s*["']?([^"'\s>]+)["']?[^>]*>(.*?)</a\s*>""", re.IGNORECASE | re.DOTALL)
+_MEDIA_RE = re.compile(r"""<(?:img|audio|video|source)\b[^>]*?\bsrc\s*=\s*["']?([^"'\s>]+)["']?[^>]*>""", re.IGNORECASE)
+_BLOCK_RE = re.compile(r"<(?:br|/?(?:p|div|li|tr|h[1-6]|table|ul|ol|pre|section|form))\b[^>]*>", re.IGNORECASE)
+_TAG_RE = re.compile(r"<[^>]+>")
+_SPACE_RE = re.compile(r"[ \t\r\f\v]+")
+
+
+def _link(m: "re.Match") -> str:
+    href = m.group(1)
+    if href.startswith(("javascript:", "#")):
+        return m.group(2)
+    if href.startswith("data:"):
+        href = href.split(",", 1)[0] + ",..."
+    return f"{m.group(2)} [{href}]"
+
+
+def visible_text(html: str) -> str:
+    """
+    What a reader of the page sees: text with block structure kept as line
+    breaks and links inlined as ``text [href]``. Scripts, styles, comments
+    and every attribute are dropped.
+    """
+    html = _INVISIBLE_RE.sub("", html)
+    html = _LINK_RE.sub(_link, html)
+    html = _MEDIA_RE.sub(lambda m: f"[media: {m.group(1)}]", html)
+    text = htmllib.unescape(_TAG_RE.sub("", _BLOCK_RE.sub("\n", html)))
+    lines = (_SPACE_RE.sub(" ", line).strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def _fmt(v) -> str:
+    try:
+        return f"{float(v):.6g}"
+    except (TypeError, ValueError):
+        return str(v)
+
+
+def describe_frame(df: pd.DataFrame) -> str:
+    """
+    Column name, dtype and a few stats per column, computed over ``df``
+    (normally a sample of the table), instead of the rows themselves.
+    """
+    lines = [f"{len(df.columns)} columns; stats over the first {len(df)} rows"]
+    for col in df.columns:
+        s = df[col]
+        desc = f"- {col} ({s.dtype})"
+        present = s.dropna()
+        if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s) and len(present):
+            desc += f": min {_fmt(present.min())}, max {_fmt(present.max())}, mean {_fmt(present.mean())}"
+        elif len(present):
+            values = present.astype(str).unique()
+            sample = ", ".join(repr(v[:40]) for v in values[:PROMPT_SAMPLE_VALUES])
+            desc += f": {len(values)} distinct, e.g. {sample}"
+        missing = len(s) - len(present)
+        if missing:
+            desc += f"; {missing} missing"
+        lines.append(desc)
+    return "\n".join(lines)
+
+
+# ----------------------------------------------------------------------
+# budgeting
+# ----------------------------------------------------------------------
+class Section:
+    """
+    One labelled block of a prompt. ``priority`` 0 is never cut; among the
+    rest the highest number is cut first. ``raw`` is what would have been
+    sent without compaction, for the before/after token report.
+    """
+
+    def __init__(self, label: str, text: str, priority: int = 1, raw: Optional[str] = None):
+        self.label = label
+        self.text = text
+        self.priority = priority
+        self.raw = text if raw is None else raw
+
+    def render(self) -> str:
+        return f"{self.label}:\n{self.text}" if self.label else self.text
+
+
+def compose(sections: List[Section], model: Optional[str] = None, budget: Optional[int] = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    Join ``sections`` into one prompt of at most ``budget`` tokens (the
+    model's budget by default), truncating the least important sections
+    first. Returns the prompt and a token report.
+    """
+    budget = budget_for(model) if budget is None else budget
+    sections = [s for s in sections if s.text]
+    sizes = [count_tokens(s.render(), model) for s in sections]
+    before = sum(count_tokens(f"{s.label}:\n{s.raw}", model) for s in sections)
+    truncated = {}
+
+    over = sum(sizes) - budget
+    for i in sorted(range(len(sections)), key=lambda i: -sections[i].priority):
+        if over <= 0 or sections[i].priority == 0:
+            break
+        s = sections[i]
+        # a couple of tokens of slack for the " ..." marker and the joining newline
+        keep = max(0, count_tokens(s.text, model) - over - 3)
+        s.text = truncate_tokens(s.text, keep, model)
+        new_size = count_tokens(s.render(), model) if s.text else 0
+        truncated[s.label] = [sizes[i], new_size]
+        over -= sizes[i] - new_size
+        sizes[i] = new_size
+
+    prompt = "\n".join(s.render() for s in sections if s.text)
+    report = {
+        "model": model,
+        "budget": budget,
+        "tokens_before": before,
+        "tokens_after": count_tokens(prompt, model),
+        "exact": HAVE_TIKTOKEN,
+    }
+    if truncated:
+        report["truncated"] = truncated
+    return prompt, report
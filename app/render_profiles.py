@@ -0,0 +1,122 @@
+import json
+import os
+from collections import deque
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+from app.log import get_logger
+
+from dotenv import load_dotenv
+load_dotenv()
+
+log = get_logger("render")
+
+DEFAULT_BLOCKED_TYPES = ["image", "media", "font", "stylesheet"]
+
+# JSON object of host -> profile overrides, e.g.
+# {"tds-llm-analysis.s-anand.net": {"settle_ms": 200}, "slow.example.com": {"ceiling_ms": 15000}}
+RENDER_PROFILES = os.getenv("RENDER_PROFILES", "")
+
+
+class RenderProfile:
+    """
+    How to load a page: which requests to block and when to stop waiting.
+
+    Waiting ends on whichever comes first: ``wait_selector`` holding text,
+    the DOM going ``settle_ms`` without mutations, or ``ceiling_ms``.
+    """
+
+    def __init__(self, name: str = "default", blocked_types: Optional[List[str]] = None,
+                 block_third_party: bool = True, wait_selector: Optional[str] = "#result",
+                 settle_ms: int = 500, ceiling_ms: int = 8000):
+        self.name = name
+        self.blocked_types = set(DEFAULT_BLOCKED_TYPES if blocked_types is None else blocked_types)
+        self.block_third_party = block_third_party
+        self.wait_selector = wait_selector
+        self.settle_ms = settle_ms
+        self.ceiling_ms = ceiling_ms
+
+    def should_block(self, resource_type: str, request_url: str, page_url: str) -> bool:
+        if resource_type in self.blocked_types:
+            return True
+        if self.block_third_party and resource_type not in ("document",):
+            return _site(request_url) != _site(page_url)
+        return False
+
+
+def _site(url: str) -> str:
+    """Registrable-ish domain: last two labels of the host."""
+    host = urlparse(url).hostname or ""
+    return ".".join(host.split(".")[-2:])
+
+
+def _load_overrides() -> Dict[str, Dict[str, Any]]:
+    if not RENDER_PROFILES:
+        return {}
+    try:
+        return json.loads(RENDER_PROFILES)
+    except ValueError as e:
+        log.error("invalid RENDER_PROFILES: %s", e)
+        return {}
+
+
+_overrides = _load_overrides()
+
+
+def get_profile(url: str) -> RenderProfile:
+    host = urlparse(url).hostname or ""
+    overrides = _overrides.get(host)
+    if overrides is None:
+        return RenderProfile()
+    return RenderProfile(name=host, **overrides)
+
+
+# resolves with "selector", "settled" or "ceiling"; no fixed sleeps
+WAIT_JS = """
+({selector, settleMs, ceilingMs}) => new Promise(resolve => {
+    const ready = () => {
+        if (!selector) return false;
+        const el = document.querySelector(selector);
+        return !!(el && el.textContent.trim().length > 0);
+    };
+    if (ready()) { resolve("selector"); return; }
+    let settleTimer = null;
+    let ceilingTimer = null;
+    const observer = new MutationObserver(() => {
+        if (ready()) { finish("selector"); return; }
+        clearTimeout(settleTimer);
+        settleTimer = setTimeout(() => finish("settled"), settleMs);
+    });
+    const finish = (reason) => {
+        observer.disconnect();
+        clearTimeout(settleTimer);
+        clearTimeout(ceilingTimer);
+        resolve(reason);
+    };
+    observer.observe(document.documentElement, {childList: true, subtree: true, characterData: true, attributes: true});
+    settleTimer = setTimeout(() => finish("settled"), settleMs);
+    ceilingTimer = setTimeout(() => finish("ceiling"), ceilingMs);
+})
+"""
+
+
+# recent per-phase render timings, for p50/p95 tuning
+_recent: "deque[Dict[str, Any]]" = deque(maxlen=int(os.getenv("RENDER_STATS_WINDOW", "500")))
+
+
+def record_phases(phases: Dict[str, Any]):
+    _recent.append(phases)
+
+
+def phase_stats() -> Dict[str, Dict[str, float]]:
+    out = {}
+    for phase in ("goto", "wait", "evaluate", "total"):
+        values = sorted(p[phase] for p in _recent if phase in p)
+        if not values:
+            continue
+        out[phase] = {
+            "count": len(values),
+            "p50": values[len(values) // 2],
+            "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+        }
+    return out
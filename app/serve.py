@@ -0,0 +1,128 @@
+"""
+Pre-forked launcher for the API.
+
+The app is imported once in the parent, then WEB_WORKERS children are
+forked and share its listening socket. Each child inherits the imported
+modules (copy-on-write) instead of importing them again, and runs its own
+lifespan: warmup, browser pool, HTTP clients. Children that die are
+replaced.
+
+Children share nothing but the socket. Request coalescing, the recent-result
+cache, SOLVE_PER_EMAIL_LIMIT and /stats are per process, so with N workers
+one email may run up to N x SOLVE_PER_EMAIL_LIMIT solves. JOB_MODE=queue
+needs a queue the workers share (sqlite:// or redis://): with memory:// a
+job enqueued by one child cannot be polled from another, so that
+combination refuses to start.
+
+    python -m app.serve --workers 4 --port 7860
+"""
+import argparse
+import os
+import signal
+import socket
+import sys
+import time
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from app.log import get_logger
+
+log = get_logger("serve")
+
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", "1"))
+WEB_HOST = os.getenv("WEB_HOST", "0.0.0.0")
+WEB_PORT = int(os.getenv("PORT", "7860"))
+
+
+def _child(sock: socket.socket, index: int):
+    import uvicorn
+    from app.main import app
+    os.environ["WEB_WORKER_INDEX"] = str(index)
+    server = uvicorn.Server(uvicorn.Config(app, log_level=os.getenv("UVICORN_LOG_LEVEL", "info")))
+    server.run(sockets=[sock])
+
+
+def _check_workers(workers: int):
+    """Refuse configurations whose state would silently split across workers."""
+    if workers <= 1:
+        return
+    from app.job_queue import JOB_QUEUE_URL
+    from app.main import JOB_MODE
+    if JOB_MODE == "queue" and JOB_QUEUE_URL.startswith("memory://"):
+        log.error("JOB_MODE=queue with a memory:// queue cannot serve %d workers: each would have its "
+                  "own queue; set JOB_QUEUE_URL to sqlite:// or redis://, or WEB_WORKERS=1", workers)
+        sys.exit(2)
+    log.warning("%d workers: request coalescing and the per-email limit apply per worker", workers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the API from pre-forked workers")
+    parser.add_argument("--workers", type=int, default=WEB_WORKERS)
+    parser.add_argument("--host", default=WEB_HOST)
+    parser.add_argument("--port", type=int, default=WEB_PORT)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    import app.main  # noqa: F401  heavy imports happen once, before forking
+    log.info("app imported in %.2fs", time.perf_counter() - started)
+    _check_workers(args.workers)
+
+    if args.workers <= 1 or not hasattr(os, "fork"):
+        import uvicorn
+        workers = max(1, args.workers)
+        # no fork() here: let uvicorn spawn (each worker imports the app itself)
+        uvicorn.run("app.main:app" if workers > 1 else app.main.app, host=args.host, port=args.port, workers=workers)
+        return
+
+    sock = socket.socket(socket.AF_INET6 if ":" in args.host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    children = {}
+    stopping = False
+
+    def spawn(index: int):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            try:
+                _child(sock, index)
+            finally:
+                os._exit(0)
+        children[pid] = index
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for i in range(args.workers):
+        spawn(i)
+    log.info("%d workers forked in %.2fs", args.workers, time.perf_counter() - started)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        index = children.pop(pid, None)
+        if index is not None and not stopping:
+            log.warning("worker %d (pid %d) exited with status %d, restarting", index, pid, status)
+            time.sleep(1)
+            spawn(index)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List
+
+from app.tracing import observe
+
+
+class Timeline:
+    """
+    Start/end offsets of the stages of one quiz step, relative to when the
+    step began. Overlapping stages show up as overlapping intervals, so the
+    wall time saved by running them concurrently can be read straight off.
+    """
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+
+    def now(self) -> float:
+        return time.perf_counter() - self.t0
+
+    def record(self, stage: str, start: float, end: float, **extra):
+        self.spans.append({"stage": stage, "start": round(start, 3), "end": round(end, 3), **extra})
+        # also feeds the stage histograms and the request trace
+        observe(stage, self.t0 + start, self.t0 + end, **extra)
+
+    @contextmanager
+    def span(self, stage: str, **extra):
+        start = self.now()
+        try:
+            yield
+        finally:
+            self.record(stage, start, self.now(), **extra)
+
+    def durations(self) -> Dict[str, float]:
+        out: Dict[str, float] = {}
+        for s in self.spans:
+            out[s["stage"]] = round(out.get(s["stage"], 0.0) + s["end"] - s["start"], 3)
+        return out
+
+    def summary(self) -> Dict[str, Any]:
+        """Wall time of the step vs. the sum of its stage times."""
+        wall = max((s["end"] for s in self.spans), default=0.0)
+        busy = sum(s["end"] - s["start"] for s in self.spans)
+        return {"wall": round(wall, 3), "stage_sum": round(busy, 3), "overlap_saved": round(max(0.0, busy - wall), 3)}
+
+    def as_list(self) -> List[Dict[str, Any]]:
+        return sorted(self.spans, key=lambda s: s["start"])
@@ -0,0 +1,72 @@
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.metrics import STAGE_SECONDS
+
+# "llm_1"/"llm_2" -> "llm", so repeated stages share one histogram series
+_STAGE_SUFFIX_RE = re.compile(r"_\d+$")
+
+
+class Trace:
+    """
+    Every span recorded while one request runs, in any module. Spans carry
+    their start/end offsets from the start of the request plus attributes
+    (file, model, token counts, ...).
+    """
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+
+    def add(self, name: str, start: float, end: float, **attrs):
+        self.spans.append({"name": name, "start": round(start - self.t0, 4), "seconds": round(end - start, 4), **attrs})
+
+    def summary(self) -> Dict[str, Any]:
+        totals: Dict[str, float] = {}
+        for s in self.spans:
+            totals[s["name"]] = round(totals.get(s["name"], 0.0) + s["seconds"], 4)
+        return {"stages": totals, "spans": sorted(self.spans, key=lambda s: s["start"])}
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar("quiz_trace", default=None)
+
+
+def start_trace() -> Trace:
+    """
+    Begin collecting spans for the current request. Tasks and threads
+    started afterwards (asyncio.create_task, asyncio.to_thread) inherit it.
+    """
+    trace = Trace()
+    _current.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+def observe(name: str, start: float, end: float, **attrs):
+    """Record a finished span (perf_counter times): histogram always, trace if one is active."""
+    STAGE_SECONDS.observe(max(0.0, end - start), stage=_STAGE_SUFFIX_RE.sub("", name))
+    trace = _current.get()
+    if trace is not None:
+        trace.add(name, start, end, **attrs)
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[Dict[str, Any]]:
+    """
+    Time a block. The yielded dict can be filled in while the block runs
+    (e.g. token counts once the reply arrives); it is attached to the span.
+    """
+    start = time.perf_counter()
+    try:
+        yield attrs
+    except BaseException as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        observe(name, start, time.perf_counter(), **attrs)
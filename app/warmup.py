@@ -0,0 +1,105 @@
+import asyncio
+import importlib
+import os
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+from urllib.parse import urlparse
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from app.log import get_logger
+
+log = get_logger("warmup")
+
+# steps run before /ready reports ready, in order:
+#   browser  launch the browser pool
+#   llm      open a keep-alive TLS connection to the LLM endpoint (no model call)
+#   http     the same for every origin in WARMUP_URLS (e.g. the quiz host)
+#   parse    read, describe and query a tiny CSV (pandas, expression engine, tokenizer)
+#   pdf, ocr import the PDF / OCR libraries that are otherwise loaded on first use
+WARMUP_STEPS = [s.strip() for s in os.getenv("WARMUP_STEPS", "browser,llm,http,parse").split(",") if s.strip()]
+WARMUP_URLS = [u.strip() for u in os.getenv("WARMUP_URLS", "").split(",") if u.strip()]
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "60"))
+
+
+async def _prime(url: str):
+    from app.http_client import get_async_client
+    parts = urlparse(url)
+    # any response will do: the point is DNS, TCP and TLS on a pooled connection
+    await get_async_client().head(f"{parts.scheme}://{parts.netloc}/", timeout=10)
+
+
+async def _browser():
+    from app.browser_pool import get_pool
+    await asyncio.to_thread(get_pool().start)
+
+
+async def _llm():
+    from app.llm_transport import AIPIPE_URL
+    await _prime(AIPIPE_URL)
+
+
+async def _http():
+    await asyncio.gather(*(_prime(u) for u in WARMUP_URLS))
+
+
+def _parse_sync():
+    from app.dataset import LazyDataset
+    from app.expression_engine import evaluate
+    from app.prompt_builder import count_tokens, describe_frame
+    with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+        f.write("k,v\na,1\nb,2\n")
+    try:
+        ds = LazyDataset(f.name)
+        count_tokens(describe_frame(ds.preview()))
+        evaluate(ds.load(), "df.groupby('k')['v'].sum()")
+    finally:
+        os.unlink(f.name)
+
+
+async def _parse():
+    await asyncio.to_thread(_parse_sync)
+
+
+def _import(*modules: str):
+    for module in modules:
+        importlib.import_module(module)
+
+
+async def _pdf():
+    await asyncio.to_thread(_import, "pdfplumber")
+
+
+async def _ocr():
+    await asyncio.to_thread(_import, "PIL.Image", "pytesseract")
+
+
+STEPS: Dict[str, Callable[[], Any]] = {
+    "browser": _browser, "llm": _llm, "http": _http, "parse": _parse, "pdf": _pdf, "ocr": _ocr,
+}
+
+
+async def run_warmup(steps: List[str] = WARMUP_STEPS, timeout: float = WARMUP_TIMEOUT) -> Dict[str, Any]:
+    """
+    Run the warmup steps one after another. A failing or slow step is
+    reported and skipped, never fatal: the app is ready either way.
+    Returns {"seconds", "steps": {name: seconds}, "errors": {name: message}}.
+    """
+    started = time.perf_counter()
+    report: Dict[str, Any] = {"steps": {}, "errors": {}}
+    for name in steps:
+        step = STEPS.get(name)
+        if step is None:
+            report["errors"][name] = "unknown step"
+            continue
+        t0 = time.perf_counter()
+        try:
+            await asyncio.wait_for(step(), timeout=max(1.0, timeout - (t0 - started)))
+        except Exception as e:
+            report["errors"][name] = f"{type(e).__name__}: {e}"
+            log.warning("warmup step %s failed: %s", name, e)
+        report["steps"][name] = round(time.perf_counter() - t0, 3)
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    return report
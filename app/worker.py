@@ -0,0 +1,182 @@
+"""
+Job workers for /solve in queue mode.
+
+Run inside the API process (JOB_LOCAL_WORKERS) or standalone, on this or any
+other host that can reach the queue:
+
+    JOB_QUEUE_URL=redis://queue-host:6379/0 python -m app.worker --processes 4
+
+Each process owns one browser pool, so jobs for a quiz host it has already
+served are preferred (browser affinity).
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+from app.job_queue import JOB_MAX_ATTEMPTS, get_job_queue
+from app.log import get_logger
+from app.tracing import start_trace
+
+from dotenv import load_dotenv
+load_dotenv()
+
+log = get_logger("worker")
+
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", os.getenv("BROWSER_POOL_SIZE", "2")))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "0.5"))
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "5"))
+# a running job whose heartbeat is older than this is handed to another worker
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "30"))
+
+
+class Worker:
+    """Pulls jobs from ``queue`` and runs up to ``concurrency`` solves at a time."""
+
+    def __init__(self, queue=None, worker_id: Optional[str] = None, concurrency: int = JOB_CONCURRENCY):
+        self.queue = queue or get_job_queue()
+        self.id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.concurrency = max(1, concurrency)
+        # quiz hosts this worker's browsers have recently loaded
+        self.hosts: "deque[str]" = deque(maxlen=8)
+        self.stats = {"claimed": 0, "done": 0, "failed": 0, "retried": 0, "reaped": 0, "stale": 0}
+
+    async def run(self, stop: asyncio.Event):
+        tasks = [asyncio.create_task(self._slot(stop)) for _ in range(self.concurrency)]
+        tasks.append(asyncio.create_task(self._reaper(stop)))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for t in tasks:
+                t.cancel()
+
+    async def _sleep(self, stop: asyncio.Event, seconds: float):
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _slot(self, stop: asyncio.Event):
+        while not stop.is_set():
+            try:
+                job = await asyncio.to_thread(self.queue.claim, self.id, list(self.hosts))
+            except Exception as e:
+                log.warning("job claim failed: %s", e)
+                job = None
+            if job is None:
+                await self._sleep(stop, JOB_POLL_SECONDS)
+                continue
+            self.stats["claimed"] += 1
+            await self._process(job)
+
+    async def _reaper(self, stop: asyncio.Event):
+        while not stop.is_set():
+            try:
+                self.stats["reaped"] += await asyncio.to_thread(self.queue.reap, JOB_STALE_SECONDS)
+            except Exception as e:
+                log.warning("job reap failed: %s", e)
+            await self._sleep(stop, JOB_STALE_SECONDS / 2)
+
+    async def _heartbeat(self, job_id: str):
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+            try:
+                await asyncio.to_thread(self.queue.heartbeat, job_id, self.id)
+            except Exception as e:
+                log.warning("job heartbeat failed %s: %s", job_id, e)
+
+    def _stale(self, job: Dict[str, Any]):
+        # the reaper handed the job on while this solve ran; its outcome is dropped
+        self.stats["stale"] += 1
+        log.warning("job %s no longer owned by %s, result dropped", job["id"], self.id)
+
+    async def _process(self, job: Dict[str, Any]):
+        # imported here so the queue/CLI side stays light
+        from app.solver import asolve_quiz_entrypoint, SUBMIT_RESERVE_SECONDS
+
+        p = job["payload"]
+        # retries share the original budget, counted from when /solve was called
+        remaining = p["budget"] - (time.time() - job["created_at"])
+        if remaining <= SUBMIT_RESERVE_SECONDS:
+            await asyncio.to_thread(self.queue.fail, job["id"], self.id, "budget exhausted before start", False)
+            self.stats["failed"] += 1
+            return
+
+        beat = asyncio.create_task(self._heartbeat(job["id"]))
+        trace = start_trace()
+        try:
+            result = await asyncio.wait_for(asolve_quiz_entrypoint(p["email"], p["secret"], p["url"], remaining),
+                                            timeout=remaining + 5)
+            result["trace"] = trace.summary()
+        except Exception as e:
+            log.exception("job %s failed", job["id"])
+            error = "solver time out" if isinstance(e, asyncio.TimeoutError) else f"solver error {e}"
+            if await asyncio.to_thread(self.queue.fail, job["id"], self.id, error, True):
+                self.stats["retried" if job["attempts"] < JOB_MAX_ATTEMPTS else "failed"] += 1
+            else:
+                self._stale(job)
+        else:
+            if await asyncio.to_thread(self.queue.complete, job["id"], self.id, result):
+                self.stats["done"] += 1
+            else:
+                self._stale(job)
+        finally:
+            beat.cancel()
+            if job.get("affinity"):
+                if job["affinity"] in self.hosts:
+                    self.hosts.remove(job["affinity"])
+                self.hosts.append(job["affinity"])
+
+
+async def _serve(concurrency: int):
+    from app.browser_pool import get_pool, shutdown_pool
+    from app.http_client import close_async_client
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        await asyncio.to_thread(get_pool().start)
+    except Exception as e:
+        log.error("browser pool start failed: %s", e)
+    worker = Worker(concurrency=concurrency)
+    log.info("worker %s polling %s", worker.id, type(worker.queue).__name__)
+    try:
+        await worker.run(stop)
+    finally:
+        await close_async_client()
+        await asyncio.to_thread(shutdown_pool)
+
+
+def _process_main(concurrency: int):
+    asyncio.run(_serve(concurrency))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run /solve job workers")
+    parser.add_argument("--processes", type=int, default=1, help="worker processes, each with its own browser pool")
+    parser.add_argument("--concurrency", type=int, default=JOB_CONCURRENCY, help="concurrent jobs per process")
+    args = parser.parse_args()
+    if args.processes <= 1:
+        _process_main(args.concurrency)
+        return
+    ctx = multiprocessing.get_context("spawn")
+    procs = [ctx.Process(target=_process_main, args=(args.concurrency,)) for _ in range(args.processes)]
+    for proc in procs:
+        proc.start()
+    try:
+        for proc in procs:
+            proc.join()
+    except KeyboardInterrupt:
+        for proc in procs:
+            proc.terminate()
+
+
+if __name__ == "__main__":
+    main()
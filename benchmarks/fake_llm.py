@@ -0,0 +1,120 @@
+"""
+Deterministic stand-in for the AI Pipe responses endpoint, for offline
+benchmarks. Point the app at it with
+
+    AIPIPE_URL=http://127.0.0.1:8802/openai/v1/responses AIPIPE_TOKEN=bench
+
+It reads the solver's prompt the way a model would for the pages served by
+benchmarks.quiz_server: column sums become a pandas expression, PDF totals
+are summed from the extracted numbers and codes are read from the OCR text.
+Every reply waits ``latency_ms`` (+/- ``jitter_ms``, seeded) before its
+first token, then ``token_ms`` per output token. The answer object is
+followed by ``tail_tokens`` of explanation, like a chatty model. Requests
+with ``"stream": true`` get server-sent events, one token per delta.
+
+    python -m benchmarks.fake_llm --port 8802 --latency-ms 800 --jitter-ms 200 --token-ms 5 --tail-tokens 300
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+from typing import Any, Dict, List
+
+from fastapi import FastAPI, Request
+from starlette.responses import StreamingResponse
+
+_SUM_COLUMN_RE = re.compile(r'sum of the "(\w+)" column')
+_NUMBERS_RE = re.compile(r"NUMBERS_EXTRACTED_FROM_PDF:\s*\n?(\[.*?\])", re.DOTALL)
+_CODE_RE = re.compile(r"CODE\s*(\d{4})")
+
+
+def answer_for(prompt: str) -> Dict[str, Any]:
+    m = _SUM_COLUMN_RE.search(prompt)
+    if m:
+        return {"expression": f"df['{m.group(1)}'].sum()", "answer_type": "number", "answer": 0}
+    m = _NUMBERS_RE.search(prompt)
+    if m:
+        numbers = [float(n) for n in re.findall(r"\d+(?:\.\d+)?", m.group(1))]
+        return {"expression": None, "answer_type": "number", "answer": sum(numbers)}
+    m = _CODE_RE.search(prompt.split("OCR_TEXT_FROM_IMAGES", 1)[-1]) if "OCR_TEXT_FROM_IMAGES" in prompt else None
+    if m:
+        return {"expression": None, "answer_type": "number", "answer": int(m.group(1))}
+    return {"expression": None, "answer_type": "string", "answer": "unknown"}
+
+
+def reply_tokens(prompt: str, tail_tokens: int) -> List[str]:
+    """The reply split into ~4-character tokens: the answer object, then filler."""
+    text = json.dumps(answer_for(prompt))
+    tail = " The value was computed from the provided data." * (tail_tokens // 12 + 1)
+    tokens = [text[i:i + 4] for i in range(0, len(text), 4)]
+    return tokens + ["\n"] + [tail[i:i + 4] for i in range(0, tail_tokens * 4, 4)]
+
+
+def create_app(latency_ms: float = 800, jitter_ms: float = 0, seed: int = 0,
+               token_ms: float = 0, tail_tokens: int = 0) -> FastAPI:
+    app = FastAPI()
+    rng = random.Random(seed)
+    app.state.stats = {"calls": 0, "streamed": 0, "input_tokens": 0, "output_tokens": 0, "tokens_sent": 0}
+
+    def count(prompt: str, tokens: List[str]) -> Dict[str, int]:
+        usage = {"input_tokens": len(prompt) // 4, "output_tokens": len(tokens)}
+        app.state.stats["calls"] += 1
+        app.state.stats["input_tokens"] += usage["input_tokens"]
+        app.state.stats["output_tokens"] += usage["output_tokens"]
+        return usage
+
+    @app.post("/openai/v1/responses")
+    async def responses(request: Request):
+        body = await request.json()
+        prompt = str(body.get("input", ""))
+        delay = max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms)) / 1000
+        tokens = reply_tokens(prompt, tail_tokens)
+        usage = count(prompt, tokens)
+
+        if body.get("stream"):
+            app.state.stats["streamed"] += 1
+
+            async def events():
+                await asyncio.sleep(delay)
+                for token in tokens:
+                    if token_ms:
+                        await asyncio.sleep(token_ms / 1000)
+                    app.state.stats["tokens_sent"] += 1
+                    yield "data: %s\n\n" % json.dumps({"type": "response.output_text.delta", "delta": token})
+                done = {"type": "response.completed", "response": {"model": body.get("model"), "usage": usage}}
+                yield "data: %s\n\n" % json.dumps(done)
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        await asyncio.sleep(delay + token_ms * len(tokens) / 1000)
+        app.state.stats["tokens_sent"] += len(tokens)
+        return {
+            "model": body.get("model"),
+            "output": [{"role": "assistant", "content": [{"type": "output_text", "text": "".join(tokens)}]}],
+            "usage": usage,
+        }
+
+    @app.get("/stats")
+    def stats():
+        return app.state.stats
+
+    return app
+
+
+def main():
+    import uvicorn
+    parser = argparse.ArgumentParser(description="Deterministic fake LLM endpoint")
+    parser.add_argument("--port", type=int, default=8802)
+    parser.add_argument("--latency-ms", type=float, default=800)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--token-ms", type=float, default=0, help="delay per output token")
+    parser.add_argument("--tail-tokens", type=int, default=0, help="filler tokens after the answer object")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency_ms, args.jitter_ms, args.seed, args.token_ms, args.tail_tokens), host="127.0.0.1", port=args.port,
+                log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Micro-benchmark: app.html_extract.extract_page vs. the regex scans it replaced.
+
+    python -m benchmarks.html_extract_bench [--kb 2048] [--repeat 20]
+"""
+import argparse
+import re
+import time
+from urllib.parse import urljoin, urlparse
+
+from app.html_extract import extract_page
+
+BASE_URL = "https://quiz.example.com/tasks/42"
+
+
+def legacy_extract(url, html):
+    """The pre-refactor find_submit_and_question_from_html + download link scan."""
+    submit = None
+    m = re.search(r"https?://[^\s'\"<>]+/submit[^\s'\"<>]*", html)
+    if m:
+        submit = m.group(0)
+    q = ""
+    m2 = re.search(r'<div[^>]*id=["\']result["\'][^>]*>(.*?)</div>', html, flags=re.DOTALL | re.IGNORECASE)
+    if m2:
+        q = re.sub(r"<[^>]+>", "", m2.group(1)).strip()
+    if not q:
+        m3 = re.search(r"<pre[^>]*>(.*?)</pre>", html, flags=re.DOTALL | re.IGNORECASE)
+        if m3:
+            q = re.sub(r"<[^>]+>", "", m3.group(1)).strip()
+    links = []
+    for ext in [".csv", ".pdf", ".xlsx", ".json", ".zip"]:
+        for m in re.finditer(r'href=["\']([^"\']+%s)["\']' % re.escape(ext), html, flags=re.IGNORECASE):
+            link = m.group(1)
+            if not urlparse(link).netloc:
+                link = urljoin(url, link)
+            links.append(link)
+    return submit, q, links
+
+
+def make_page(kb: int) -> str:
+    block = (
+        '<div class="row"><span class="cell">lorem ipsum dolor sit amet</span>'
+        '<a class="nav" href="/docs/page.html">docs</a><img src="/static/logo.svg" alt="">'
+        '<p style="color: #333">consectetur adipiscing elit, sed do eiusmod tempor</p></div>\n'
+    )
+    filler = block * max(1, (kb * 1024) // len(block))
+    return (
+        "<html><head><script>var cfg = {api: 'https://cdn.example.com/lib.js'};</script></head><body>"
+        + filler[: len(filler) // 2]
+        + '<div id="result"><p>Q42. Download <a href="/files/data.csv">this file</a> and the '
+        + "<a href=/files/report.pdf>report</a>. Post the sum to https://quiz.example.com/submit</p></div>"
+        + filler[len(filler) // 2:]
+        + "</body></html>"
+    )
+
+
+def bench(fn, html, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(html)
+        times.append(time.perf_counter() - t0)
+    times.sort()
+    return times[len(times) // 2], times[0]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--kb", type=int, nargs="*", default=[64, 512, 2048])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    for kb in args.kb:
+        html = make_page(kb)
+        legacy = bench(lambda h: legacy_extract(BASE_URL, h), html, args.repeat)
+        # bypass the memo so every run does the full pass
+        new = bench(lambda h: extract_page.__wrapped__(h, BASE_URL), html, args.repeat)
+        print(f"{kb:>6} KB  legacy median {legacy[0] * 1000:8.2f} ms  extract_page median {new[0] * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Local stand-in for the quiz site, for offline benchmarks.
+
+Every chain is a fixed sequence of steps (``--steps``); each step is one page
+whose answer is derived deterministically from (chain, step):
+
+    csv    static #result, CSV attachment          -> HTTP fast path
+    xlsx   static #result, XLSX attachment         (needs openpyxl)
+    atob   #result filled by atob() inline script  -> static decode path
+    js     #result built by JavaScript             -> browser render
+    pdf    PDF attachment with numbers in its text -> PDF text path
+    image  PNG attachment with a printed code      -> OCR path
+
+POST /submit checks the answer and returns the next step's URL, like the
+real site. Recorded pages can be replayed too: every ``<name>.html`` in
+``--recordings`` is served at /recorded/<name>, with ``{{BASE}}`` replaced
+by this server's base URL.
+
+    python -m benchmarks.quiz_server --port 8801 [--steps csv,atob,js,pdf]
+"""
+import argparse
+import base64
+import io
+import json
+import random
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from starlette.responses import HTMLResponse, JSONResponse, Response
+
+DEFAULT_STEPS = ["csv", "atob", "js", "pdf"]
+ROWS = 500
+
+
+def _rng(chain: str, step: int) -> random.Random:
+    return random.Random(zlib.crc32(f"{chain}/{step}".encode()))
+
+
+def table_for(chain: str, step: int) -> Dict[str, List]:
+    rng = _rng(chain, step)
+    return {
+        "id": list(range(1, ROWS + 1)),
+        "category": [rng.choice(["alpha", "beta", "gamma", "delta"]) for _ in range(ROWS)],
+        "value": [rng.randint(1, 1000) for _ in range(ROWS)],
+    }
+
+
+def numbers_for(chain: str, step: int) -> List[int]:
+    rng = _rng(chain, step)
+    return [rng.randint(10, 999) for _ in range(12)]
+
+
+def code_for(chain: str, step: int) -> int:
+    return _rng(chain, step).randint(1000, 9999)
+
+
+def expected_answer(kind: str, chain: str, step: int) -> Any:
+    if kind in ("csv", "xlsx", "atob", "js"):
+        return sum(table_for(chain, step)["value"])
+    if kind == "pdf":
+        return sum(numbers_for(chain, step))
+    return code_for(chain, step)
+
+
+def csv_bytes(chain: str, step: int) -> bytes:
+    t = table_for(chain, step)
+    lines = ["id,category,value"] + [f"{i},{c},{v}" for i, c, v in zip(t["id"], t["category"], t["value"])]
+    return ("\n".join(lines) + "\n").encode()
+
+
+def xlsx_bytes(chain: str, step: int) -> bytes:
+    import pandas as pd
+    buf = io.BytesIO()
+    pd.DataFrame(table_for(chain, step)).to_excel(buf, index=False)
+    return buf.getvalue()
+
+
+def pdf_bytes(lines: List[str]) -> bytes:
+    """A minimal one-page PDF with ``lines`` as text (no external PDF library)."""
+    text = "BT /F1 12 Tf 72 720 Td 16 TL " + " ".join(
+        "(%s) Tj T*" % l.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for l in lines) + " ET"
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 5 0 R >> >> /Contents 4 0 R >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(text), text.encode()),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (i, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for off in offsets:
+        out += b"%010d 00000 n \n" % off
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def png_bytes(text: str) -> bytes:
+    from PIL import Image, ImageDraw, ImageFont
+    img = Image.new("L", (640, 160), 255)
+    try:
+        font = ImageFont.load_default(size=48)
+    except TypeError:
+        font = ImageFont.load_default()
+    ImageDraw.Draw(img).text((30, 50), text, fill=0, font=font)
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def create_app(steps: Optional[List[str]] = None, recordings: Optional[str] = None) -> FastAPI:
+    steps = steps or DEFAULT_STEPS
+    app = FastAPI()
+    app.state.stats = {"pages": 0, "files": 0, "submits": 0, "correct": 0}
+    recorded = {p.stem: p.read_text() for p in Path(recordings).glob("*.html")} if recordings else {}
+
+    def base(request: Request) -> str:
+        return str(request.base_url).rstrip("/")
+
+    def question(kind: str, chain: str, step: int, b: str) -> str:
+        files = f"{b}/files/{chain}/{step}"
+        if kind in ("csv", "atob", "js"):
+            q = f'Download <a href="{files}/data.csv">the data</a>. What is the sum of the "value" column?'
+        elif kind == "xlsx":
+            q = f'Download <a href="{files}/data.xlsx">the workbook</a>. What is the sum of the "value" column?'
+        elif kind == "pdf":
+            q = f'Download <a href="{files}/report.pdf">the report</a>. What is the total of all numbers in it?'
+        else:
+            q = f'Look at <a href="{files}/code.png">this image</a>. What is the CODE printed in it?'
+        return (f"<p>Q{step} (chain {chain}). {q}</p>"
+                f"<p>Post your answer to {b}/submit with email, secret, url and answer.</p>")
+
+    @app.get("/quiz/{chain}/{step}")
+    def page(chain: str, step: int, request: Request):
+        if not 1 <= step <= len(steps):
+            raise HTTPException(status_code=404)
+        app.state.stats["pages"] += 1
+        kind = steps[step - 1]
+        q = question(kind, chain, step, base(request))
+        if kind == "atob":
+            encoded = base64.b64encode(q.encode()).decode()
+            body = (f'<div id="result"></div><script>'
+                    f'document.querySelector("#result").innerHTML = atob("{encoded}");</script>')
+        elif kind == "js":
+            parts = json.dumps([q[i:i + 40] for i in range(0, len(q), 40)])
+            body = (f'<div id="result"></div><script>setTimeout(function () {{'
+                    f'document.getElementById("result").innerHTML = {parts}.join("");}}, 50);</script>')
+        else:
+            body = f'<div id="result">{q}</div>'
+        return HTMLResponse(f"<html><head><title>Quiz</title></head><body><h1>Quiz</h1>{body}</body></html>")
+
+    @app.get("/recorded/{name}")
+    def recorded_page(name: str, request: Request):
+        if name not in recorded:
+            raise HTTPException(status_code=404)
+        app.state.stats["pages"] += 1
+        return HTMLResponse(recorded[name].replace("{{BASE}}", base(request)))
+
+    @app.get("/files/{chain}/{step}/{name}")
+    def files(chain: str, step: int, name: str):
+        app.state.stats["files"] += 1
+        if name == "data.csv":
+            return Response(csv_bytes(chain, step), media_type="text/csv")
+        if name == "data.xlsx":
+            return Response(xlsx_bytes(chain, step),
+                            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        if name == "report.pdf":
+            nums = numbers_for(chain, step)
+            lines = ["Quarterly report"] + [f"Amount: {n}" for n in nums]
+            return Response(pdf_bytes(lines), media_type="application/pdf")
+        if name == "code.png":
+            return Response(png_bytes(f"CODE {code_for(chain, step)}"), media_type="image/png")
+        raise HTTPException(status_code=404)
+
+    @app.post("/submit")
+    async def submit(request: Request):
+        app.state.stats["submits"] += 1
+        payload = await request.json()
+        parts = str(payload.get("url", "")).rstrip("/").split("/")
+        try:
+            chain, step = parts[-2], int(parts[-1])
+            kind = steps[step - 1]
+        except (IndexError, ValueError):
+            return JSONResponse({"correct": False, "reason": "unknown url", "url": None})
+        expected = expected_answer(kind, chain, step)
+        try:
+            correct = abs(float(payload.get("answer")) - float(expected)) < 1e-6
+        except (TypeError, ValueError):
+            correct = False
+        app.state.stats["correct"] += int(correct)
+        next_url = f"{base(request)}/quiz/{chain}/{step + 1}" if step < len(steps) else None
+        return JSONResponse({"correct": correct, "url": next_url,
+                             "reason": None if correct else f"expected {expected}"})
+
+    @app.get("/stats")
+    def stats():
+        return app.state.stats
+
+    return app
+
+
+def main():
+    import uvicorn
+    parser = argparse.ArgumentParser(description="Local quiz stand-in")
+    parser.add_argument("--port", type=int, default=8801)
+    parser.add_argument("--steps", default=",".join(DEFAULT_STEPS))
+    parser.add_argument("--recordings", default=None, help="directory of recorded <name>.html pages")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.steps.split(","), args.recordings), host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""
+Offline replay benchmark for the whole quiz chain.
+
+Starts the local quiz stand-in and the fake LLM in-process. The app under
+test runs as its own uvicorn process, pointed at both. Each scenario fires
+N concurrent quiz chains at POST /solve. The report covers p50/p95
+latency, throughput, peak RSS of the app's process tree (browsers
+included) and a per-stage breakdown taken from each solve's trace. It is
+written as JSON so runs can be compared across commits.
+
+    python -m benchmarks.replay_bench --concurrency 1 10 100 --latency-ms 800 --out bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import httpx
+import uvicorn
+
+from benchmarks.fake_llm import create_app as create_llm_app
+from benchmarks.quiz_server import DEFAULT_STEPS, create_app as create_quiz_app
+
+SECRET = "bench-secret"
+
+
+class ServerThread:
+    """A uvicorn server on a background thread."""
+
+    def __init__(self, app, port: int):
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.05)
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
+
+
+class RssSampler:
+    """Peak resident memory of a process and all its descendants (Linux /proc)."""
+
+    def __init__(self, pid: int, interval: float = 0.25):
+        self.pid = pid
+        self.interval = interval
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _tree(self) -> List[int]:
+        children: Dict[int, List[int]] = {}
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+        tree, todo = [], [self.pid]
+        while todo:
+            pid = todo.pop()
+            tree.append(pid)
+            todo.extend(children.get(pid, []))
+        return tree
+
+    def _rss(self) -> int:
+        total = 0
+        for pid in self._tree():
+            try:
+                with open(f"/proc/{pid}/statm") as f:
+                    total += int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+            except (OSError, IndexError, ValueError):
+                continue
+        return total
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_bytes = max(self.peak_bytes, self._rss())
+            self._stop.wait(self.interval)
+
+    def reset(self):
+        self.peak_bytes = 0
+
+    def start(self):
+        if os.path.isdir("/proc"):
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(q * len(values) + 0.5)) - 1))]
+
+
+def summarise(values: List[float]) -> Dict[str, float]:
+    return {"p50": round(percentile(values, 0.50), 4), "p95": round(percentile(values, 0.95), 4),
+            "mean": round(sum(values) / len(values), 4) if values else 0.0, "count": len(values)}
+
+
+def launch_app(port: int, llm_url: str, args) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "SECRET_KEY": SECRET,
+        "MAX_RUN_SECOND": str(args.max_run_seconds),
+        "AIPIPE_URL": llm_url,
+        "AIPIPE_TOKEN": "bench",
+        "LLM_CACHE_ENABLED": "1" if args.llm_cache else "0",
+        "DOWNLOAD_DIR": tempfile.mkdtemp(prefix="quiz-bench-downloads-"),
+        "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+        # the quiz stand-in serves all of its pages from one host
+        "DOWNLOAD_PER_HOST_LIMIT": os.environ.get("DOWNLOAD_PER_HOST_LIMIT", "64"),
+    }
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+                             "--port", str(port)], env=env, cwd=str(Path(__file__).resolve().parent.parent))
+    proc.launched = time.perf_counter()
+    deadline = time.time() + args.startup_timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"app exited during startup with code {proc.returncode}")
+        try:
+            # /ready waits for the warmup; trees without it only have /
+            status = httpx.get(f"http://127.0.0.1:{port}/ready", timeout=1).status_code
+            if status == 404:
+                status = httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code
+            if status == 200:
+                proc.ready_seconds = time.perf_counter() - proc.launched
+                return proc
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("app did not come up in time")
+
+
+async def run_scenario(concurrency: int, app_url: str, quiz_base: str, tag: str, args) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=concurrency + 10, max_keepalive_connections=concurrency + 10)
+    async with httpx.AsyncClient(timeout=args.max_run_seconds + 60, limits=limits) as client:
+
+        async def chain(i: int) -> Dict[str, Any]:
+            # unique chain ids keep coalescing and result caches from short-circuiting runs
+            chain_id = f"{tag}-c{concurrency}-{i}"
+            body = {"email": f"{chain_id}@bench.local", "secret": SECRET,
+                    "url": f"{quiz_base}/quiz/{chain_id}/1", "trace": True}
+            t0 = time.perf_counter()
+            try:
+                r = await client.post(f"{app_url}/solve", json=body)
+                data = r.json() if r.headers.get("content-type", "").startswith("application/json") else {}
+                ok = r.status_code == 200
+            except httpx.HTTPError as e:
+                data, ok = {"error": str(e)}, False
+            return {"seconds": time.perf_counter() - t0, "ok": ok, "data": data}
+
+        t0 = time.perf_counter()
+        runs = await asyncio.gather(*(chain(i) for i in range(concurrency)))
+        wall = time.perf_counter() - t0
+
+    stages: Dict[str, List[float]] = {}
+    steps_total = steps_correct = 0
+    for run in runs:
+        result = run["data"].get("result") or {}
+        for step in result.get("steps", []):
+            steps_total += 1
+            steps_correct += bool((step.get("submit_result") or {}).get("correct"))
+        for name, seconds in ((run["data"].get("trace") or {}).get("stages") or {}).items():
+            stages.setdefault(name, []).append(seconds)
+
+    return {
+        "concurrency": concurrency,
+        "chains": len(runs),
+        "ok": sum(r["ok"] for r in runs),
+        "wall_seconds": round(wall, 3),
+        "throughput_chains_per_s": round(len(runs) / wall, 4) if wall else 0.0,
+        "steps": steps_total,
+        "steps_correct": steps_correct,
+        "steps_per_s": round(steps_total / wall, 4) if wall else 0.0,
+        "latency_seconds": summarise([r["seconds"] for r in runs]),
+        "stages_seconds": {name: summarise(values) for name, values in sorted(stages.items())},
+        "errors": [r["data"].get("detail") or r["data"].get("error") for r in runs if not r["ok"]][:5],
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       cwd=str(Path(__file__).resolve().parent.parent)).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline replay benchmark for /solve")
+    parser.add_argument("--concurrency", type=int, nargs="*", default=[1, 10, 100])
+    parser.add_argument("--steps", default=",".join(DEFAULT_STEPS), help="page kinds of each chain, see quiz_server")
+    parser.add_argument("--latency-ms", type=float, default=800, help="fake LLM latency")
+    parser.add_argument("--jitter-ms", type=float, default=200)
+    parser.add_argument("--token-ms", type=float, default=5, help="fake LLM delay per output token")
+    parser.add_argument("--tail-tokens", type=int, default=300, help="fake LLM tokens after the answer object")
+    parser.add_argument("--max-run-seconds", type=int, default=170)
+    parser.add_argument("--llm-cache", action="store_true", help="leave the app's LLM cache on")
+    parser.add_argument("--startup-timeout", type=float, default=60)
+    parser.add_argument("--quiz-port", type=int, default=8801)
+    parser.add_argument("--llm-port", type=int, default=8802)
+    parser.add_argument("--app-port", type=int, default=8803)
+    parser.add_argument("--out", default=None, help="JSON report path (default: bench-<commit>-<time>.json)")
+    args = parser.parse_args()
+
+    quiz = ServerThread(create_quiz_app(args.steps.split(",")), args.quiz_port)
+    llm_app = create_llm_app(args.latency_ms, args.jitter_ms, token_ms=args.token_ms, tail_tokens=args.tail_tokens)
+    llm = ServerThread(llm_app, args.llm_port)
+    quiz.start()
+    llm.start()
+    quiz_base = f"http://127.0.0.1:{args.quiz_port}"
+    app_url = f"http://127.0.0.1:{args.app_port}"
+    proc = launch_app(args.app_port, f"http://127.0.0.1:{args.llm_port}/openai/v1/responses", args)
+    sampler = RssSampler(proc.pid)
+    sampler.start()
+
+    tag = time.strftime("%H%M%S")
+    scenarios = []
+    startup = {"launch_to_ready_seconds": round(proc.ready_seconds, 3)}
+    try:
+        for concurrency in args.concurrency:
+            sampler.reset()
+            scenario = asyncio.run(run_scenario(concurrency, app_url, quiz_base, tag, args))
+            scenario["peak_rss_mb"] = round(sampler.peak_bytes / 2 ** 20, 1)
+            scenarios.append(scenario)
+            lat = scenario["latency_seconds"]
+            print(f"c={concurrency:<4} p50 {lat['p50']:7.2f}s  p95 {lat['p95']:7.2f}s  "
+                  f"{scenario['throughput_chains_per_s']:6.2f} chains/s  "
+                  f"{scenario['steps_correct']}/{scenario['steps']} steps correct  "
+                  f"peak RSS {scenario['peak_rss_mb']} MB")
+        r = httpx.get(f"{app_url}/ready", timeout=5)
+        if r.status_code == 200:
+            # import/warmup timings and the first solve, as the app measured them
+            startup.update(r.json())
+    finally:
+        sampler.stop()
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        quiz.stop()
+        llm.stop()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "settings": {"steps": args.steps.split(","), "llm_latency_ms": args.latency_ms, "llm_jitter_ms": args.jitter_ms,
+                     "llm_token_ms": args.token_ms, "llm_tail_tokens": args.tail_tokens,
+                     "max_run_seconds": args.max_run_seconds, "llm_cache": args.llm_cache},
+        "startup": startup,
+        "scenarios": scenarios,
+        "quiz_server": quiz.server.config.app.state.stats,
+        "fake_llm": llm.server.config.app.state.stats,
+    }
+    out = args.out or f"bench-{report['commit']}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    Path(out).write_text(json.dumps(report, indent=2))
+    print("report written to", out)
+
+
+if __name__ == "__main__":
+    main()
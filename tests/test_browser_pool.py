@@ -0,0 +1,48 @@
+import asyncio
+
+from app.browser_pool import BrowserPool, _Slot
+
+
+class _Context:
+    async def close(self):
+        pass
+
+
+class _Browser:
+    def is_connected(self):
+        return True
+
+    async def new_context(self, **kwargs):
+        return _Context()
+
+    async def close(self):
+        pass
+
+
+class _SlowStartPool(BrowserPool):
+    """Launching takes a while, as a cold Chromium does."""
+
+    async def _astart(self):
+        await asyncio.sleep(0.3)
+        self._idle = asyncio.Queue()
+        self._slots = [_Slot(i) for i in range(self.size)]
+        for slot in self._slots:
+            slot.browser = _Browser()
+            self._idle.put_nowait(slot)
+
+
+def test_second_caller_waits_for_a_cold_start():
+    pool = _SlowStartPool(size=1)
+
+    async def render(context):
+        return "ok"
+
+    async def main():
+        first = asyncio.create_task(pool.arun(render))
+        await asyncio.sleep(0.1)
+        return await asyncio.gather(first, pool.arun(render))
+
+    try:
+        assert asyncio.run(main()) == ["ok", "ok"]
+    finally:
+        pool.shutdown()
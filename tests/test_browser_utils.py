@@ -0,0 +1,60 @@
+import asyncio
+
+from app import browser_utils
+from app.browser_utils import afetch_page_static, decode_inline_scripts, needs_render
+
+SCRIPTED_PAGE = """<html><body>
+<div id="result"></div>
+<p>Post your answer to /submit</p>
+<pre>{"email": "you@example.com", "answer": 12345}</pre>
+<script>
+fetch("/question.txt").then(r => r.text()).then(t => { document.querySelector("#result").innerHTML = t; });
+</script>
+</body></html>"""
+
+ATOB_PAGE = """<html><body>
+<div id="result"></div>
+<script>
+document.querySelector("#result").innerHTML = atob("V2hhdCBpcyB0aGUgc3VtPyBQT1NUIHRvIC9zdWJtaXQ=");
+</script>
+</body></html>"""
+
+
+class _Response:
+    def __init__(self, text: str, url: str):
+        self.text = text
+        self.url = url
+        self.headers = {"content-type": "text/html; charset=utf-8"}
+
+    def raise_for_status(self):
+        pass
+
+
+class _Client:
+    def __init__(self, text: str):
+        self.text = text
+
+    async def get(self, url, timeout=None):
+        return _Response(self.text, url)
+
+
+def test_empty_result_filled_by_script_needs_render():
+    assert needs_render(decode_inline_scripts(SCRIPTED_PAGE))
+
+
+def test_atob_result_is_served_statically():
+    html = decode_inline_scripts(ATOB_PAGE)
+    assert not needs_render(html)
+    assert "What is the sum?" in html
+
+
+def test_static_tier_escalates_on_empty_result(monkeypatch):
+    monkeypatch.setattr(browser_utils, "get_async_client", lambda: _Client(SCRIPTED_PAGE))
+    assert asyncio.run(afetch_page_static("https://quiz.example.com/q/1")) is None
+
+
+def test_static_tier_accepts_decoded_page(monkeypatch):
+    monkeypatch.setattr(browser_utils, "get_async_client", lambda: _Client(ATOB_PAGE))
+    html, final_url = asyncio.run(afetch_page_static("https://quiz.example.com/q/1"))
+    assert final_url == "https://quiz.example.com/q/1"
+    assert "What is the sum?" in html
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.dataset import LazyDataset, downcast
+
+
+@pytest.fixture
+def prices_csv(tmp_path):
+    rng = np.random.default_rng(7)
+    df = pd.DataFrame({
+        "price": np.round(rng.uniform(0, 100, 100_000), 2),
+        "qty": rng.integers(1, 10, 100_000),
+        "region": rng.choice(["north", "south", "east"], 100_000),
+        "date": rng.choice(["2024-01-15", "2024-03-01", "2023-12-31"], 100_000),
+    })
+    path = tmp_path / "prices.csv"
+    df.to_csv(path, index=False)
+    return str(path), pd.read_csv(path)
+
+
+def test_downcast_keeps_floats_as_float64():
+    df = downcast(pd.DataFrame({"f": [0.1, 0.2], "i": [1, 2]}))
+    assert df["f"].dtype == np.float64
+    assert df["i"].dtype == np.int8
+
+
+def test_float_sum_matches_pandas(prices_csv):
+    path, plain = prices_csv
+    ds = LazyDataset(path)
+    assert ds.load(["price"])["price"].sum() == pytest.approx(plain["price"].sum(), rel=1e-12, abs=0)
+    filtered = ds.load()
+    assert filtered.loc[filtered["region"] == "north", "price"].sum() == pytest.approx(
+        plain.loc[plain["region"] == "north", "price"].sum(), rel=1e-12, abs=0)
+
+
+def test_streamed_reductions_match_pandas(prices_csv):
+    path, plain = prices_csv
+    ds = LazyDataset(path)
+    assert ds.reduce("price", "sum") == pytest.approx(plain["price"].sum(), rel=1e-12, abs=0)
+    assert ds.reduce("price", "mean") == pytest.approx(plain["price"].mean(), rel=1e-12, abs=0)
+    assert ds.reduce("price", "max") == plain["price"].max()
+
+
+def test_integer_sum_stays_integer(tmp_path):
+    path = tmp_path / "ints.csv"
+    path.write_text("n\n1\n2\n3\n")
+    total = LazyDataset(str(path)).reduce("n", "sum")
+    assert total == 6 and isinstance(total, int)
+
+
+def test_min_max_on_string_and_date_columns(prices_csv):
+    path, plain = prices_csv
+    ds = LazyDataset(path)
+    assert ds.reduce("date", "max") == "2024-03-01"
+    assert ds.reduce("date", "min") == "2023-12-31"
+    assert ds.reduce("region", "min") == plain["region"].min()
+    assert ds.reduce("region", "count") == len(plain)
+
+
+def test_groupby_on_string_values(prices_csv):
+    path, plain = prices_csv
+    ds = LazyDataset(path)
+    assert ds.groupby_agg("region", "date", "max").to_dict() == plain.groupby("region")["date"].max().to_dict()
+    sums = ds.groupby_agg("region", "qty", "sum")
+    assert sums.to_dict() == plain.groupby("region")["qty"].sum().to_dict()
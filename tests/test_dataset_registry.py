@@ -0,0 +1,78 @@
+import json
+
+import pandas as pd
+
+from app import dataset_registry
+from app.dataset_registry import DatasetRegistry, FrameCache
+
+
+def test_mixed_and_duplicate_columns_survive_the_cache():
+    cache = FrameCache(2 ** 20)
+    frames = {
+        "mixed": pd.DataFrame({"value": [1, "n/a", 2.5]}),
+        "dupes": pd.DataFrame([[1, 2], [3, 4]], columns=["amount", "amount"]),
+        "numbered": pd.DataFrame([[1, 2]], columns=[0, 1]),
+    }
+    cache.set("k", frames)
+    out = cache.get("k")
+    for name, df in frames.items():
+        pd.testing.assert_frame_equal(out[name], df)
+
+
+def test_mixed_type_json_table_is_registered(tmp_path):
+    path = tmp_path / "orders.json"
+    path.write_text(json.dumps([{"id": 1, "code": 7}, {"id": 2, "code": "A7"}]))
+    tables = DatasetRegistry().add_file(str(path))
+    assert list(tables) == ["orders"]
+    assert tables["orders"].load()["code"].tolist() == [7, "A7"]
+
+
+def test_content_keys_are_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(dataset_registry, "_CONTENT_KEYS_MAX", 3)
+    monkeypatch.setattr(dataset_registry, "_content_keys", type(dataset_registry._content_keys)())
+    for i in range(5):
+        path = tmp_path / f"t{i}.csv"
+        path.write_text(f"a\n{i}\n")
+        dataset_registry.content_key(str(path))
+    assert len(dataset_registry._content_keys) == 3
+
+
+def test_evicted_frames_drop_their_content_keys(tmp_path, monkeypatch):
+    monkeypatch.setattr(dataset_registry, "_content_keys", type(dataset_registry._content_keys)())
+    paths = []
+    for i in range(2):
+        path = tmp_path / f"t{i}.json"
+        path.write_text(json.dumps([{"a": i}] * 100))
+        paths.append(str(path))
+    keys = [dataset_registry.content_key(p) for p in paths]
+    size = FrameCache._pack(pd.DataFrame({"a": [0] * 100}))[1]
+    cache = FrameCache(size)
+    cache.set(keys[0], {"t": pd.DataFrame({"a": [0] * 100})})
+    cache.set(keys[1], {"t": pd.DataFrame({"a": [1] * 100})})
+    assert keys[0] not in dataset_registry._content_keys.values()
+    assert keys[1] in dataset_registry._content_keys.values()
+
+
+def test_tables_are_named_after_the_original_file(tmp_path):
+    stored = tmp_path / ("3f8a" * 16 + ".json")
+    stored.write_text(json.dumps([{"id": 1, "price": 9.5}]))
+    registry = DatasetRegistry()
+    tables = registry.tables_for([str(stored)], names={str(stored): "prices.json"})
+    assert list(tables) == ["prices"]
+    # the same content under another name is not handed the first name
+    assert list(registry.tables_for([str(stored)], names={str(stored): "costs.json"})) == ["costs"]
+
+
+def test_other_pdf_pages_are_parsed_again(tmp_path, monkeypatch):
+    path = tmp_path / "report.pdf"
+    path.write_bytes(b"%PDF-1.4 stub")
+
+    def fake_extract(path, pages=None):
+        return type("Extraction", (), {"tables": [pd.DataFrame({"page": pages or [0]})]})()
+
+    monkeypatch.setattr(dataset_registry, "extract_pdf", fake_extract)
+    registry = DatasetRegistry()
+    first = registry.add_file(str(path), [1])
+    second = registry.add_file(str(path), [2, 3])
+    assert first["report"].load()["page"].tolist() == [1]
+    assert second["report"].load()["page"].tolist() == [2, 3]
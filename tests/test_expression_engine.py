@@ -0,0 +1,66 @@
+import pandas as pd
+import pytest
+
+from app.dataset import LazyDataset
+from app.expression_engine import ExpressionError, evaluate
+
+ROWS = """order_id,date,region,amount,qty
+1,2024-01-15,north,10.25,3
+2,2024-03-01,south,20.10,1
+3,2023-12-31,north,0.35,2
+4,2024-02-10,east,99.99,5
+"""
+
+
+@pytest.fixture
+def orders(tmp_path):
+    path = tmp_path / "orders.csv"
+    path.write_text(ROWS)
+    return LazyDataset(str(path)), pd.read_csv(path)
+
+
+def test_max_of_date_column(orders):
+    ds, _ = orders
+    assert evaluate(ds, "df['date'].max()") == "2024-03-01"
+    assert evaluate(ds, "df['date'].min()") == "2023-12-31"
+
+
+def test_min_of_string_column(orders):
+    ds, _ = orders
+    assert evaluate(ds, "df['region'].min()") == "east"
+    assert evaluate(ds, "df['region'].count()") == 4
+
+
+def test_non_numeric_reductions_are_not_streamed(orders, monkeypatch):
+    ds, _ = orders
+    monkeypatch.setattr(ds, "reduce", lambda column, op: pytest.fail(f"streamed {op} over {column}"))
+    assert evaluate(ds, "df['region'].max()") == "south"
+
+
+def test_groupby_over_string_values(orders):
+    ds, plain = orders
+    assert evaluate(ds, "df.groupby('region')['date'].max()") == plain.groupby("region")["date"].max().to_dict()
+
+
+def test_float_sum_matches_pandas(orders):
+    ds, plain = orders
+    assert evaluate(ds, "df['amount'].sum()") == pytest.approx(plain["amount"].sum(), rel=1e-12, abs=0)
+    assert evaluate(ds, "df[df['region'] == 'north']['amount'].sum()") == pytest.approx(
+        plain[plain["region"] == "north"]["amount"].sum(), rel=1e-12, abs=0)
+
+
+def test_integer_sum_is_an_int(orders):
+    ds, _ = orders
+    total = evaluate(ds, "df['qty'].sum()")
+    assert total == 11 and isinstance(total, int)
+
+
+def test_date_arithmetic(orders):
+    ds, _ = orders
+    assert evaluate(ds, "pd.to_datetime(df['date']).dt.month.max()") == 12
+
+
+def test_disallowed_expression(orders):
+    ds, _ = orders
+    with pytest.raises(ExpressionError):
+        evaluate(ds, "df.__class__")
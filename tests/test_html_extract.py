@@ -0,0 +1,29 @@
+from app.html_extract import extract_page
+
+BASE = "https://quiz.example.com/quiz/3"
+
+
+def test_submit_input_type_is_not_an_endpoint():
+    html = """<div id="result">What is 2 + 2?</div>
+<p>POST your answer to /submit</p>
+<form><input type="submit" value="Send"></form>"""
+    assert extract_page(html, BASE).submit_url == "https://quiz.example.com/submit"
+
+
+def test_submit_button_id_is_not_an_endpoint():
+    html = """<div id="result">What is 2 + 2?</div>
+<button id="submit-btn" class="submit">Send</button>
+<p>Post to /submit with your email.</p>"""
+    assert extract_page(html, BASE).submit_url == "https://quiz.example.com/submit"
+
+
+def test_form_action_wins_over_link():
+    html = """<div id="result">Q</div>
+<a href="/help/submit-guide">how to submit</a>
+<form action="/api/submit" method="post"><input type="submit"></form>"""
+    assert extract_page(html, BASE).submit_url == "https://quiz.example.com/api/submit"
+
+
+def test_absolute_submit_url_in_text():
+    html = '<div id="result">Send to https://tds.example.org/submit now</div><input type="submit">'
+    assert extract_page(html, BASE).submit_url == "https://tds.example.org/submit"
@@ -0,0 +1,93 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app import job_queue
+from app.job_queue import DONE, QUEUED, MemoryQueue, RedisQueue, SQLiteQueue
+
+
+@pytest.fixture
+def redis_queues(monkeypatch):
+    """Two RedisQueue clients (say a worker and a reaper) on one fake server."""
+    fakeredis = pytest.importorskip("fakeredis")
+    import redis
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(redis.Redis, "from_url",
+                        lambda url, **kwargs: fakeredis.FakeRedis(server=server, **kwargs))
+    return RedisQueue("redis://fake"), RedisQueue("redis://fake")
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def queue(request, tmp_path):
+    if request.param == "memory":
+        return MemoryQueue()
+    if request.param == "sqlite":
+        return SQLiteQueue(str(tmp_path / "jobs.sqlite3"))
+    return request.getfixturevalue("redis_queues")[0]
+
+
+def test_stale_worker_cannot_complete_requeued_job(queue):
+    job_id = queue.put({"url": "https://quiz.example.com/1"})
+    queue.claim("w1")
+    assert queue.reap(-1) == 1
+    assert queue.complete(job_id, "w1", {"answer": 1}) is False
+    assert queue.get(job_id)["status"] == QUEUED
+    # still claimable exactly once
+    assert queue.claim("w2")["id"] == job_id
+    assert queue.claim("w3") is None
+
+
+def test_only_the_new_owner_records_the_outcome(queue):
+    job_id = queue.put({"url": "https://quiz.example.com/1"})
+    queue.claim("w1")
+    queue.reap(-1)
+    queue.claim("w2")
+    assert queue.fail(job_id, "w1", "late failure") is False
+    assert queue.complete(job_id, "w2", {"answer": 2}) is True
+    job = queue.get(job_id)
+    assert job["status"] == DONE and job["result"] == {"answer": 2}
+    assert queue.complete(job_id, "w2", {"answer": 3}) is False
+
+
+def test_reap_between_read_and_write_wins_on_redis(redis_queues, monkeypatch):
+    worker, reaper = redis_queues
+    job_id = worker.put({"url": "https://quiz.example.com/1"})
+    worker.claim("w1")
+    fired = []
+
+    def clock():
+        # the reaper requeues the job while complete() is between its read and its write
+        if not fired:
+            fired.append(1)
+            assert reaper.reap(-1) == 1
+        return time.time()
+
+    monkeypatch.setattr(job_queue, "time", SimpleNamespace(time=clock))
+    assert worker.complete(job_id, "w1", {"answer": 1}) is False
+    assert worker.get(job_id)["status"] == QUEUED
+    assert worker.stats() == {"queued": 1, "running": 0, "done": 0, "failed": 0}
+
+
+@pytest.mark.parametrize("kind", ["memory", "sqlite"])
+def test_finished_jobs_are_pruned(kind, tmp_path, monkeypatch):
+    queue = MemoryQueue() if kind == "memory" else SQLiteQueue(str(tmp_path / "jobs.sqlite3"))
+    job_id = queue.put({"url": "https://quiz.example.com/1"})
+    queue.claim("w1")
+    queue.complete(job_id, "w1", {"answer": 1})
+    pending = queue.put({"url": "https://quiz.example.com/2"})
+    assert queue.get(job_id)["status"] == DONE
+    later = time.time() + job_queue.JOB_RESULT_TTL + 1
+    monkeypatch.setattr(job_queue, "time", SimpleNamespace(time=lambda: later))
+    queue.put({"url": "https://quiz.example.com/3"})
+    assert queue.get(job_id) is None
+    assert queue.get(pending)["status"] == QUEUED
+
+
+def test_finished_jobs_expire_on_redis(redis_queues):
+    queue, _ = redis_queues
+    job_id = queue.put({"url": "https://quiz.example.com/1"})
+    queue.claim("w1")
+    assert queue._r.ttl(queue._key("job", job_id)) == -1
+    queue.complete(job_id, "w1", {"answer": 1})
+    assert 0 < queue._r.ttl(queue._key("job", job_id)) <= job_queue.JOB_RESULT_TTL
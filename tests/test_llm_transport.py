@@ -0,0 +1,48 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app import llm_transport
+from app.deadline import DeadlineExceeded
+
+BODY = {"model": "test-model", "input": "hi"}
+
+
+@pytest.fixture(autouse=True)
+def no_hedging(monkeypatch):
+    monkeypatch.setattr(llm_transport, "LLM_HEDGE_ENABLED", False)
+
+
+def test_hung_call_raises_deadline_exceeded(monkeypatch):
+    async def hang(body, token, timeout):
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(llm_transport, "_send", hang)
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(llm_transport.post_responses(BODY, "t", timeout=0.2))
+
+
+def test_read_timeout_at_the_deadline_is_a_deadline_error(monkeypatch):
+    async def slow_read(body, token, timeout):
+        await asyncio.sleep(timeout)
+        raise httpx.ReadTimeout("read timed out")
+
+    monkeypatch.setattr(llm_transport, "_send", slow_read)
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(llm_transport.post_responses(BODY, "t", timeout=0.2))
+
+
+def test_early_read_timeout_is_still_retried(monkeypatch):
+    calls = []
+
+    async def flaky(body, token, timeout):
+        calls.append(timeout)
+        if len(calls) == 1:
+            raise httpx.ReadTimeout("read timed out")
+        return {"output": []}
+
+    monkeypatch.setattr(llm_transport, "_send", flaky)
+    monkeypatch.setattr(llm_transport, "LLM_BACKOFF_BASE", 0.01)
+    assert asyncio.run(llm_transport.post_responses(BODY, "t", timeout=5)) == {"output": []}
+    assert len(calls) == 2
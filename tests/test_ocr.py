@@ -0,0 +1,29 @@
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app import ocr
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def test_tesseract_is_bounded_by_the_budget(tmp_path, monkeypatch):
+    path = tmp_path / "scan.png"
+    Image.new("RGB", (40, 20), "white").save(path)
+    seen = {}
+
+    def image_to_string(img, config="", timeout=0):
+        seen["timeout"] = timeout
+        return "42"
+
+    monkeypatch.setitem(sys.modules, "pytesseract", SimpleNamespace(image_to_string=image_to_string))
+    text, _ = ocr._ocr_job("image", str(path), None, time.time() + 5)
+    assert text == "42"
+    assert 0 < seen["timeout"] <= 5
+
+
+def test_job_past_the_budget_does_not_start(tmp_path):
+    with pytest.raises(TimeoutError):
+        ocr._ocr_job("image", str(tmp_path / "missing.png"), None, time.time() - 1)
@@ -0,0 +1,49 @@
+import asyncio
+
+import httpx
+
+from app import solver
+
+PAGE = """<div id="result">Q{n}: what is 2 + 2? Post your answer to /submit</div>"""
+
+
+def test_llm_transport_failure_keeps_the_steps_solved_so_far(monkeypatch):
+    async def fake_fetch(url, deadline=None):
+        n = url.rsplit("/", 1)[-1]
+        return PAGE.format(n=n), url, {"tier": "static"}
+
+    calls = []
+
+    async def fake_llm(*args, **kwargs):
+        calls.append(1)
+        if len(calls) > 1:
+            raise httpx.ConnectError("All connection attempts failed")
+        return {"text": '{"expression": null, "answer_type": "number", "answer": 4}'}
+
+    async def fake_submit(url, payload, deadline=None):
+        return {"correct": True, "url": "https://quiz.example.com/quiz/2"}
+
+    monkeypatch.setattr(solver, "afetch_page", fake_fetch)
+    monkeypatch.setattr(solver, "acall_llm", fake_llm)
+    monkeypatch.setattr(solver, "asubmit_answer", fake_submit)
+    result = asyncio.run(solver.asolve_quiz_entrypoint("a@b.c", "s", "https://quiz.example.com/quiz/1", 60))
+    assert result["status"] == "unable_to_solve"
+    assert [s["url"] for s in result["steps"]] == ["https://quiz.example.com/quiz/1", "https://quiz.example.com/quiz/2"]
+    assert result["steps"][0]["answer"] == 4
+    assert result["steps"][0]["submit_result"]["correct"] is True
+
+
+def test_page_text_is_sent_alongside_the_question():
+    html = """<div id="result">What is the total of the amount column?</div>
+<p>Give the answer in cents, as an integer.</p>"""
+    prompt, _ = solver.build_answer_prompt("What is the total of the amount column?", html, [], None, None)
+    assert "in cents, as an integer" in prompt
+
+
+def test_page_text_is_truncated_before_anything_else(monkeypatch):
+    compose = solver.compose
+    monkeypatch.setattr(solver, "compose", lambda sections, model: compose(sections, model, budget=150))
+    html = "<div id='result'>What is 2 + 2?</div><p>" + "filler text " * 400 + "</p>"
+    prompt, report = solver.build_answer_prompt("What is 2 + 2?", html, [], None, ["4", "5"])
+    assert list(report["truncated"]) == ["PAGE_TEXT"]
+    assert "NUMBERS_EXTRACTED_FROM_PDF" in prompt and "What is 2 + 2?" in prompt